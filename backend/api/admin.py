@@ -0,0 +1,25 @@
+from django.contrib import admin
+from django.contrib.admin import register
+from django.http import HttpResponse
+
+from .models import ProfileReport
+
+
+@register(ProfileReport)
+class ProfileReportAdmin(admin.ModelAdmin):
+    list_display = ('method', 'path', 'status', 'duration',
+                    'sql_count', 'memory_peak', 'user', 'created',)
+    list_select_related = ('user',)
+    search_fields = ('path',)
+    readonly_fields = [field.name for field in ProfileReport._meta.fields]
+    show_full_result_count = False
+    actions = ('download',)
+
+    @admin.action(description='Скачать отчёты')
+    def download(self, request, queryset):
+        response = HttpResponse(
+            '\n\n'.join(report.report for report in queryset),
+            content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = (
+            'attachment; filename="profile.txt"')
+        return response
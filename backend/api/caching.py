@@ -0,0 +1,88 @@
+"""Кэширование ответов API.
+
+Вместо удаления ключей при изменениях данных увеличивается счётчик
+поколения: он входит в ключи кэша, и старые записи просто перестают
+читаться и вытесняются по таймауту.
+
+cached() пересчитывает значение только в одном потоке или процессе, а
+остальные ждут результата. Между процессами и поколения, и блокировка
+работают только с общим кэшем (memcached); с кэшем в памяти процесса
+(CACHE_SHARED = False) значения, которые сбрасываются поколением, не
+кэшируются.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_WAIT_SECONDS = 0.05
+
+
+def _generation_key(name):
+    return f'generation:{name}'
+
+
+def generation(name):
+    """Текущее поколение данных name"""
+    return cache.get_or_set(_generation_key(name),
+                            lambda: int(time.time() * 1000), None)
+
+
+def bump_generation(*names):
+    for name in names:
+        try:
+            cache.incr(_generation_key(name))
+        except ValueError:
+            generation(name)
+
+
+def _recompute(key, lock_key, compute, timeout):
+    try:
+        start = time.perf_counter()
+        value = compute()
+        delta = time.perf_counter() - start
+        cache.set(key, (value, delta, time.time() + timeout), timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def cached(key, compute, timeout, beta=1.0, versioned=False):
+    """Значение compute() из кэша с единственным пересчётом.
+
+    Незадолго до истечения срока значение пересчитывается заранее с
+    вероятностью, растущей к концу срока и с временем вычисления
+    (XFetch), поэтому записи не истекают у всех клиентов одновременно.
+    Пока один клиент пересчитывает, остальные получают старое значение,
+    а при пустом кэше ждут до CACHE_LOCK_SECONDS.
+
+    versioned=True — ключ содержит версию самих данных, а не поколение,
+    и значение можно кэшировать даже в памяти процесса.
+    """
+    if not (settings.CACHE_SHARED or versioned):
+        return compute()
+    lock_key = f'lock:{key}'
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expiry = entry
+        if time.time() - delta * beta * math.log(
+                1 - random.random()) < expiry:
+            return value
+        if not cache.add(lock_key, True, settings.CACHE_LOCK_SECONDS):
+            return value
+        return _recompute(key, lock_key, compute, timeout)
+    deadline = time.monotonic() + settings.CACHE_LOCK_SECONDS
+    while not cache.add(lock_key, True, settings.CACHE_LOCK_SECONDS):
+        if time.monotonic() > deadline:
+            return compute()
+        time.sleep(LOCK_WAIT_SECONDS)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    entry = cache.get(key)
+    if entry is not None:
+        cache.delete(lock_key)
+        return entry[0]
+    return _recompute(key, lock_key, compute, timeout)
@@ -4,6 +4,14 @@ from rest_framework.filters import SearchFilter
 from recipes.models import Recipe
 from users.models import User
 
+# Каждой сортировке соответствует индекс; id — однозначный последний ключ
+ORDERINGS = {
+    'cooking_time': ('cooking_time', 'id'),
+    '-cooking_time': ('-cooking_time', '-id'),
+    'name': ('name', 'id'),
+    '-id': ('-id',),
+}
+
 
 class RecipesFilter(filter.FilterSet):
     """Фильтр сортировки рецептов"""
@@ -12,6 +20,13 @@ class RecipesFilter(filter.FilterSet):
         method='filter_is_in_shopping_cart')
     author = filter.ModelChoiceFilter(queryset=User.objects.all())
     tags = filter.AllValuesMultipleFilter(field_name='tags__slug')
+    cooking_time_min = filter.NumberFilter(field_name='cooking_time',
+                                           lookup_expr='gte')
+    cooking_time_max = filter.NumberFilter(field_name='cooking_time',
+                                           lookup_expr='lte')
+    ordering = filter.ChoiceFilter(
+        choices=[(name, name) for name in ('trending', *ORDERINGS)],
+        method='filter_ordering')
 
     def filter_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -23,6 +38,12 @@ class RecipesFilter(filter.FilterSet):
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
 
+    def filter_ordering(self, queryset, name, value):
+        if value == 'trending':
+            return queryset.filter(trending__isnull=False).order_by(
+                '-trending__score', '-id')
+        return queryset.order_by(*ORDERINGS[value])
+
     class Meta:
         model = Recipe
         fields = ('author', 'tags',)
@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from api.middleware import COMPRESSORS, compress
+
+PATHS = ('/api/tags/', '/api/ingredients/', '/api/recipes/?limit=50')
+
+
+class Command(BaseCommand):
+    help = '''Замер сжатия ответов API: экономия байт и время процессора.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('paths', nargs='*', default=PATHS)
+
+    def measure(self, function, repeat):
+        start = time.process_time()
+        for _ in range(repeat):
+            result = function()
+        return result, (time.process_time() - start) / repeat * 1000
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_ACCEPT_ENCODING='identity')
+        repeat = options['repeat']
+        for path in options['paths']:
+            response = client.get(path)
+            if response.streaming:
+                body = b''.join(response.streaming_content)
+            else:
+                body = response.content
+            self.stdout.write(
+                f'{path}: {len(body)} байт'
+                f'{", поток" if response.streaming else ""}')
+            for encoding in COMPRESSORS:
+                compressed, cpu = self.measure(
+                    lambda: compress(body, encoding), repeat)
+                saved = 100 - len(compressed) * 100 / max(len(body), 1)
+                line = (f'  {encoding} (уровень '
+                        f'{settings.COMPRESSION_LEVELS[encoding]}): '
+                        f'{len(compressed)} байт, экономия {saved:.1f}%, '
+                        f'{cpu:.2f} мс')
+                # Потоковые ответы сжимаются по частям, мимо кэша
+                if not response.streaming:
+                    compress(body, encoding, cached=True)
+                    _, cached_cpu = self.measure(
+                        lambda: compress(body, encoding, cached=True),
+                        repeat)
+                    line += f', из кэша {cached_cpu:.3f} мс'
+                self.stdout.write(line)
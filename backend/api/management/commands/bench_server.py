@@ -0,0 +1,142 @@
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+COLD_START = '''
+import os, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+from backend.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - start)
+'''
+
+CONFIGS = ('sync:1:1', 'sync:4:1', 'gthread:2:4', 'gthread:4:4')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = '''Замер холодного старта и пропускной способности gunicorn
+    в разных конфигурациях: класс_воркера:воркеры:потоки.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('configs', nargs='*', default=CONFIGS)
+        parser.add_argument('--path', default='/api/tags/')
+        parser.add_argument('--clients', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Повторов замера холодного старта')
+        parser.add_argument('--no-preload', action='store_true')
+
+    def cold_start(self, repeat):
+        times = [
+            float(subprocess.run(
+                [sys.executable, '-c', COLD_START], cwd=settings.BASE_DIR,
+                check=True, capture_output=True, text=True).stdout)
+            for _ in range(repeat)
+        ]
+        return statistics.median(times)
+
+    def start_server(self, config, preload):
+        try:
+            worker_class, workers, threads = config.split(':')
+        except ValueError:
+            raise CommandError(f'Неверная конфигурация: {config}')
+        port = free_port()
+        ready_file = os.path.join(tempfile.gettempdir(),
+                                  f'gunicorn-ready-{port}')
+        env = dict(
+            os.environ,
+            GUNICORN_BIND=f'127.0.0.1:{port}',
+            GUNICORN_WORKER_CLASS=worker_class,
+            GUNICORN_WORKERS=workers,
+            GUNICORN_THREADS=threads,
+            GUNICORN_PRELOAD=str(preload),
+            GUNICORN_ACCESS_LOG='',
+            GUNICORN_READY_FILE=ready_file,
+            # Все запросы замера идут с одного IP и упёрлись бы в лимит
+            THROTTLE_USER_RATE='',
+            THROTTLE_ANON_RATE='',
+        )
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'backend.wsgi:application',
+             '--config', 'gunicorn.conf.py'],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = start + 60
+        while time.perf_counter() < deadline:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port,
+                                                        timeout=1)
+                connection.request('GET', '/health/ready/')
+                if connection.getresponse().status == 200:
+                    return server, port, time.perf_counter() - start
+            except OSError:
+                pass
+            time.sleep(0.05)
+        server.terminate()
+        raise CommandError(f'{config}: сервер не запустился за минуту')
+
+    def load(self, port, path, clients, duration):
+        counts = [0] * clients
+        errors = [0] * clients
+        deadline = time.perf_counter() + duration
+
+        def client(number):
+            connection = http.client.HTTPConnection('127.0.0.1', port,
+                                                    timeout=30)
+            while time.perf_counter() < deadline:
+                try:
+                    connection.request('GET', path)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    errors[number] += 1
+                    connection.close()
+                    continue
+                if response.status < 400:
+                    counts[number] += 1
+                else:
+                    errors[number] += 1
+
+        threads = [threading.Thread(target=client, args=(number,))
+                   for number in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(counts) / duration, sum(errors)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'Холодный старт (импорт приложения и urls): '
+            f'{self.cold_start(options["repeat"]) * 1000:.0f} мс')
+        for config in options['configs']:
+            server, port, startup = self.start_server(
+                config, not options['no_preload'])
+            try:
+                rps, errors = self.load(port, options['path'],
+                                        options['clients'],
+                                        options['duration'])
+            finally:
+                server.terminate()
+                server.wait()
+            self.stdout.write(
+                f'{config}: запуск {startup:.2f} с, {rps:.0f} запросов/с, '
+                f'ошибок {errors}')
@@ -0,0 +1,74 @@
+import hashlib
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+
+from recipes.models import Ingredient
+
+
+class RollbackError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = '''Замер памяти при выдаче полного списка ингредиентов:
+    потоковый JSON против обычного ответа. Синтетические ингредиенты
+    создаются в транзакции и удаляются после замера.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--path', default='/api/ingredients/')
+
+    def fetch(self, client, path):
+        response = client.get(path)
+        digest = hashlib.sha256()
+        chunks = (response.streaming_content if response.streaming
+                  else [response.content])
+        for chunk in chunks:
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def measure(self, client, path):
+        """Время без трассировки памяти, пик памяти — отдельным проходом"""
+        start = time.perf_counter()
+        self.fetch(client, path)
+        duration = time.perf_counter() - start
+        tracemalloc.start()
+        digest = self.fetch(client, path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return digest, peak, duration
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise RollbackError
+        except RollbackError:
+            pass
+
+    def run(self, options):
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=f'Ингредиент {number:06d}',
+                        measurement_unit='г')
+             for number in range(options['count'])), batch_size=5000)
+        total = Ingredient.objects.count()
+        self.stdout.write(f'{options["path"]}: ингредиентов {total}')
+        client = Client(HTTP_ACCEPT_ENCODING='identity')
+        results = {}
+        for streaming in (False, True):
+            # Без общего кэша тело строится на каждый запрос
+            with override_settings(STREAM_JSON_LISTS=streaming,
+                                   CACHE_SHARED=False):
+                results[streaming] = self.measure(client, options['path'])
+            _, peak, duration = results[streaming]
+            title = 'поток' if streaming else 'целиком'
+            self.stdout.write(
+                f'  {title}: пик памяти {peak / 2 ** 20:.1f} МБ, '
+                f'{duration:.2f} с')
+        same = results[False][0] == results[True][0]
+        self.stdout.write(
+            f'  тела ответов {"совпадают" if same else "РАЗЛИЧАЮТСЯ"}')
@@ -0,0 +1,113 @@
+import base64
+import io
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes.models import ImageBlob, Ingredient, Tag
+from users.models import User
+
+CONTENT_TYPES = {
+    'base64': 'application/json',
+    'multipart': MULTIPART_CONTENT,
+}
+
+
+def memory_status(field):
+    """Поле VmRSS или VmHWM из /proc/self/status в байтах (Linux)"""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+    raise ValueError(field)
+
+
+def reset_peak_rss():
+    """Сбрасывает пиковый RSS процесса (VmHWM) до текущего"""
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+
+
+def make_image(megabytes):
+    """PNG из шума: почти не сжимается, размер файла близок к заданному"""
+    side = max(int((megabytes * 2 ** 20 / 3) ** 0.5), 1)
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', compress_level=0)
+    return buffer.getvalue()
+
+
+def build_body(mode, image, tag_id, ingredient_id):
+    """Тело запроса на создание рецепта"""
+    fields = {'name': 'Замер загрузки', 'text': 'Текст',
+              'cooking_time': 10, 'tags': [tag_id]}
+    if mode == 'base64':
+        fields['ingredients'] = [{'id': ingredient_id, 'amount': 1}]
+        fields['image'] = ('data:image/png;base64,'
+                           + base64.b64encode(image).decode())
+        return json.dumps(fields).encode()
+    file = io.BytesIO(image)
+    file.name = 'image.png'
+    fields.update({'ingredients[0]id': ingredient_id,
+                   'ingredients[0]amount': 1, 'image': file})
+    return encode_multipart(BOUNDARY, fields)
+
+
+class Command(BaseCommand):
+    help = '''Замер пикового RSS при создании рецепта с картинкой:
+    base64 в JSON против multipart/form-data. Созданные данные
+    удаляются.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megabytes', type=float, default=8)
+
+    def handle(self, *args, **options):
+        image = make_image(options['megabytes'])
+        self.stdout.write(f'Картинка {len(image) / 2 ** 20:.1f} МБ')
+        user = User.objects.create_user(
+            username='bench_upload', email='bench_upload@localhost',
+            password=None)
+        tag = Tag.objects.create(name='bench_upload', color='#000000',
+                                 slug='bench_upload')
+        ingredient = Ingredient.objects.create(name='bench_upload',
+                                               measurement_unit='г')
+        client = Client(HTTP_AUTHORIZATION='Token {}'.format(
+            Token.objects.create(user=user).key))
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root,
+                                       RECIPE_IMAGE_MAX_BYTES=len(image) * 2):
+                    for mode in CONTENT_TYPES:
+                        self.measure(client, mode, image, tag.id,
+                                     ingredient.id)
+        finally:
+            with transaction.atomic():
+                images = list(user.recipes.values_list('image', flat=True))
+                user.recipes.all().delete()
+                ImageBlob.objects.filter(name__in=images).delete()
+                user.delete()
+                tag.delete()
+                ingredient.delete()
+
+    def measure(self, client, mode, image, tag_id, ingredient_id):
+        # Маленькая картинка прогревает ленивые импорты первого запроса
+        client.generic('POST', '/api/recipes/', build_body(
+            mode, make_image(0.01), tag_id, ingredient_id),
+            CONTENT_TYPES[mode])
+        body = build_body(mode, image, tag_id, ingredient_id)
+        reset_peak_rss()
+        base = memory_status('VmRSS')
+        response = client.generic('POST', '/api/recipes/', body,
+                                  CONTENT_TYPES[mode])
+        growth = memory_status('VmHWM') - base
+        self.stdout.write(
+            f'  {mode}: ответ {response.status_code}, '
+            f'тело {len(body) / 2 ** 20:.1f} МБ, '
+            f'прирост пикового RSS {growth / 2 ** 20:.1f} МБ')
@@ -0,0 +1,218 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+from contextlib import ExitStack
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+from backend.testing import pixel
+
+BUDGETS = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))), 'budgets.json')
+
+TAGS = 3
+INGREDIENTS = 20
+INGREDIENTS_PER_RECIPE = 5
+
+
+class RollbackError(Exception):
+    pass
+
+
+def seed(authors, recipes_per_author, limit):
+    """Тестовые данные: авторы с рецептами и пользователь, который
+    подписан на всех, а рецепты (кроме одного) добавил в избранное и
+    список покупок"""
+    Tag.objects.bulk_create(
+        Tag(name=f'budget-{number}', color=f'#BD{number:04X}',
+            slug=f'budget-{number}') for number in range(TAGS))
+    tags = list(Tag.objects.filter(slug__startswith='budget-').values_list(
+        'id', flat=True))
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'budget {number}', measurement_unit='г')
+        for number in range(INGREDIENTS))
+    ingredients = list(Ingredient.objects.filter(
+        name__startswith='budget ').values_list('id', flat=True))
+    User.objects.bulk_create(
+        User(username=f'budget-{number}', email=f'budget-{number}@localhost',
+             first_name='Автор', last_name=str(number), password='!')
+        for number in range(authors + 1))
+    user, *author_list = User.objects.filter(
+        username__startswith='budget-').order_by('id')
+    Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'Рецепт {author.pk}-{number}',
+               text='Текст', cooking_time=10, image='recipes/budget.png')
+        for author in author_list for number in range(recipes_per_author))
+    recipes = list(Recipe.objects.filter(
+        author__in=author_list).order_by('id').values_list('id', flat=True))
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(recipe_id=recipe, amount=number + 1,
+                         ingredients_id=ingredients[
+                             (index + number) % len(ingredients)])
+        for index, recipe in enumerate(recipes)
+        for number in range(INGREDIENTS_PER_RECIPE))
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+        for recipe in recipes for tag in tags[:2])
+    Follow.objects.bulk_create(
+        Follow(user=user, author=author) for author in author_list)
+    for model in (Favorite, ShoppingCart):
+        model.objects.bulk_create(
+            model(user=user, recipe_id=recipe) for recipe in recipes[1:])
+    return SimpleNamespace(
+        user=user, token=Token.objects.create(user=user).key,
+        recipe=recipes[-1], fresh_recipe=recipes[0], tags=tags,
+        ingredients=ingredients, limit=limit)
+
+
+def routes(data):
+    """Запросы для каждого маршрута из файла бюджетов"""
+    limit = data.limit
+    recipe = json.dumps({
+        'name': 'Новый рецепт', 'text': 'Текст', 'cooking_time': 5,
+        'image': pixel(), 'tags': data.tags[:2],
+        'ingredients': [{'id': ingredient, 'amount': 1}
+                        for ingredient in data.ingredients[
+                            :INGREDIENTS_PER_RECIPE]]})
+    return {
+        'recipes-list': ('GET', f'/api/recipes/?limit={limit}', ''),
+        'recipes-detail': ('GET', f'/api/recipes/{data.recipe}/', ''),
+        'recipes-create': ('POST', '/api/recipes/', recipe),
+        'subscriptions': (
+            'GET', f'/api/users/subscriptions/?limit={limit}', ''),
+        'favorite': (
+            'POST', f'/api/recipes/{data.fresh_recipe}/favorite/', ''),
+        'shopping_cart': (
+            'POST', f'/api/recipes/{data.fresh_recipe}/shopping_cart/', ''),
+        'download_shopping_cart': (
+            'GET', '/api/recipes/download_shopping_cart/', ''),
+        'ingredients': ('GET', '/api/ingredients/?name=budget', ''),
+        'tags': ('GET', '/api/tags/', ''),
+        'users': ('GET', f'/api/users/?limit={limit}', ''),
+    }
+
+
+class Command(BaseCommand):
+    help = '''Проверка бюджетов API: число SQL-запросов и медиана времени
+    ответа каждого маршрута на тестовых данных двух масштабов. Число
+    запросов не должно расти вместе с размером страницы. Время зависит
+    от машины, поэтому его превышение больше чем в --latency-tolerance
+    раз только выводится как предупреждение, а с --strict-latency
+    тоже проваливает проверку. Кэш отключён, данные удаляются после
+    проверки.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budgets', default=BUDGETS)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--report',
+                            help='Файл для отчёта в JSON')
+        parser.add_argument('--latency-tolerance', type=float, default=1.5,
+                            help='Во сколько раз медиана может превысить '
+                                 'бюджет времени')
+        parser.add_argument('--strict-latency', action='store_true',
+                            help='Превышение времени проваливает проверку')
+
+    def handle(self, *args, **options):
+        with open(options['budgets']) as file:
+            budgets = json.load(file)
+        results = {}
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root,
+                CACHES={'default': {'BACKEND': (
+                    'django.core.cache.backends.dummy.DummyCache')}}):
+            for scale, params in budgets['scales'].items():
+                try:
+                    with transaction.atomic():
+                        results[scale] = self.run_scale(
+                            params, budgets['routes'], options['repeat'])
+                        raise RollbackError
+                except RollbackError:
+                    pass
+        report, breaches, slow = self.compare(
+            budgets, results, options['latency_tolerance'])
+        if options['strict_latency']:
+            breaches += slow
+        elif slow:
+            self.stderr.write('Предупреждение, время выше бюджета:\n'
+                              + '\n'.join(slow))
+        if options['report']:
+            with open(options['report'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2,
+                          sort_keys=True)
+                file.write('\n')
+        if breaches:
+            raise CommandError('Бюджеты превышены:\n' + '\n'.join(breaches))
+        self.stdout.write('Все бюджеты соблюдены')
+
+    def run_scale(self, params, budgets, repeat):
+        data = seed(**params)
+        requests = routes(data)
+        unknown = budgets.keys() ^ requests.keys()
+        if unknown:
+            raise CommandError(
+                f'Маршруты без бюджета или запроса: {sorted(unknown)}')
+        client = Client(HTTP_AUTHORIZATION=f'Token {data.token}')
+        return {name: self.measure(client, *requests[name], repeat)
+                for name in sorted(requests)}
+
+    @staticmethod
+    def measure(client, method, path, body, repeat):
+        """Запрос повторяется repeat раз, каждый раз с откатом изменений"""
+        timings, queries = [], 0
+        for _ in range(repeat):
+            with transaction.atomic(), ExitStack() as stack:
+                contexts = [
+                    stack.enter_context(CaptureQueriesContext(database))
+                    for database in connections.all()]
+                start = time.perf_counter()
+                response = client.generic(method, path, body,
+                                          'application/json')
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append(time.perf_counter() - start)
+                transaction.set_rollback(True)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{method} {path}: ответ {response.status_code}')
+            queries = max(queries, sum(map(len, contexts)))
+        return {'queries': queries,
+                'median_ms': round(statistics.median(timings) * 1000, 1)}
+
+    def compare(self, budgets, results, tolerance):
+        report, breaches, slow = {}, [], []
+        scales = list(results)
+        for name, budget in sorted(budgets['routes'].items()):
+            measured = {scale: results[scale][name] for scale in scales}
+            report[name] = {'budget': budget, **measured}
+            line = [f'{name:24}']
+            for scale in scales:
+                queries = measured[scale]['queries']
+                median = measured[scale]['median_ms']
+                line.append(f'{scale}: {queries:3} SQL {median:7.1f} мс')
+                if queries > budget['max_queries']:
+                    breaches.append(
+                        f'{name} ({scale}): {queries} SQL-запросов, '
+                        f'бюджет {budget["max_queries"]}')
+                if median > budget['max_median_ms'] * tolerance:
+                    slow.append(
+                        f'{name} ({scale}): медиана {median} мс, '
+                        f'бюджет {budget["max_median_ms"]} '
+                        f'× {tolerance}')
+            counts = [measured[scale]['queries'] for scale in scales]
+            if len(set(counts)) > 1:
+                breaches.append(
+                    f'{name}: число запросов зависит от размера страницы '
+                    f'({" → ".join(map(str, counts))})')
+            self.stdout.write('  '.join(line))
+        return report, breaches, slow
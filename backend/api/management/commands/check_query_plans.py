@@ -0,0 +1,76 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.filters import ORDERINGS, RecipesFilter
+from api.pagination import after, keyset_ordering
+from recipes.models import Recipe
+
+# Значения полей на месте курсора: план от них не зависит
+CURSOR_VALUES = {'cooking_time': 30, 'name': 'М', 'id': 1000}
+
+SORT_STEPS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY'),
+    'postgresql': re.compile(r'(^|->)\s*(Incremental )?Sort\s+\(',
+                             re.MULTILINE),
+}
+
+
+def recipe_queries(limit):
+    """Запросы списка рецептов для каждой сортировки (первая страница и
+    страница после курсора) и для выборки по времени приготовления.
+
+    Диапазон по времени проверяется только с сортировкой по нему же:
+    с другой сортировкой выбор между индексами зависит от избирательности.
+    """
+    cases = [{'ordering': ordering} for ordering in ORDERINGS]
+    cases += [{'ordering': ordering, 'cooking_time_max': 30}
+              for ordering in ('cooking_time', '-cooking_time')]
+    for params in cases:
+        queryset = RecipesFilter(
+            params, queryset=Recipe.objects.filter(author__is_deleted=False,
+                                                   is_deleted=False),
+        ).qs
+        title = '&'.join(f'{name}={value}' for name, value in params.items())
+        yield title, queryset[:limit]
+        keyset = keyset_ordering(queryset)
+        yield f'{title}&cursor=…', queryset.filter(after(
+            keyset, [CURSOR_VALUES[name] for name, _ in keyset]))[:limit]
+
+
+class Command(BaseCommand):
+    help = '''Проверка планов запросов списка рецептов: каждая сортировка
+    должна идти по индексу, без отдельного шага сортировки. В PostgreSQL
+    сортировка на время проверки запрещается (enable_sort = off), так что
+    она остаётся в плане, только если подходящего индекса нет.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--verbose-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        sort_step = SORT_STEPS.get(connection.vendor)
+        if sort_step is None:
+            raise CommandError(
+                f'Планы для {connection.vendor} не проверяются')
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_sort = off')
+            for title, queryset in recipe_queries(options['limit']):
+                plan = queryset.explain()
+                sorted_in_memory = bool(sort_step.search(plan))
+                self.stdout.write(
+                    f'{"СОРТИРОВКА" if sorted_in_memory else "индекс":10} '
+                    f'{title}')
+                if options['verbose_plans'] or sorted_in_memory:
+                    self.stdout.write(plan)
+                if sorted_in_memory:
+                    failures.append(title)
+            transaction.set_rollback(True)
+        if failures:
+            raise CommandError(
+                'Сортировка не по индексу:\n' + '\n'.join(failures))
+        self.stdout.write('Все сортировки идут по индексам')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.middleware import profiling_token
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = '''Выдача токена профилирования запросов для сотрудника.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username'],
+                                   is_staff=True).first()
+        if user is None:
+            raise CommandError('Сотрудник не найден')
+        self.stdout.write(profiling_token(user))
@@ -0,0 +1,273 @@
+import cProfile
+import gzip
+import hashlib
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+import zlib
+from contextlib import ExitStack
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import ProfileReport
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSORS = {
+    'gzip': lambda body, level: gzip.compress(body, compresslevel=level),
+}
+if brotli is not None:
+    COMPRESSORS['br'] = lambda body, level: brotli.compress(
+        body, quality=level)
+if zstandard is not None:
+    COMPRESSORS['zstd'] = lambda body, level: zstandard.ZstdCompressor(
+        level=level).compress(body)
+
+PREFERENCE = ('zstd', 'br', 'gzip')
+
+STREAMING_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+PROFILING_SALT = 'api.profiling'
+
+_profiling = threading.Lock()
+
+
+def choose_encoding(accept_encoding):
+    """Выбирает лучшее доступное сжатие из заголовка Accept-Encoding"""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        accepted[coding.strip().lower()] = quality
+    candidates = [coding for coding in PREFERENCE
+                  if coding in COMPRESSORS
+                  and accepted.get(coding, accepted.get('*', 0)) > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda coding: accepted.get(
+        coding, accepted.get('*', 0)))
+
+
+def stream_compressor(encoding, level):
+    """Объект с методами compress() и flush() для сжатия потока"""
+    if encoding == 'gzip':
+        return zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    compressor = brotli.Compressor(quality=level)
+    return SimpleNamespace(compress=compressor.process,
+                           flush=compressor.finish)
+
+
+def compress_stream(chunks, encoding):
+    compressor = stream_compressor(encoding,
+                                   settings.COMPRESSION_LEVELS[encoding])
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def compress(body, encoding, cached=False):
+    level = settings.COMPRESSION_LEVELS[encoding]
+    if not cached:
+        return COMPRESSORS[encoding](body, level)
+    digest = hashlib.sha1(body).hexdigest()
+    key = f'compressed:{encoding}:{level}:{digest}'
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = COMPRESSORS[encoding](body, level)
+        cache.set(key, compressed, settings.COMPRESSION_CACHE_SECONDS)
+    return compressed
+
+
+class CompressionMiddleware:
+    """Сжатие ответов gzip, brotli или zstd.
+
+    Для путей из COMPRESSION_CACHE_PATHS сжатое тело кэшируется по хэшу
+    исходного, и одинаковые ответы не сжимаются повторно. Потоковые
+    ответы сжимаются по частям, без кэша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding'):
+            return response
+        if response.streaming:
+            if not response.get('Content-Type', '').startswith(
+                    STREAMING_TYPES):
+                return response
+        elif len(response.content) < settings.COMPRESSION_MIN_LENGTH:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding)
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+            return self.mark_encoded(response, encoding)
+        cached = (response.status_code == 200
+                  and request.path.startswith(
+                      settings.COMPRESSION_CACHE_PATHS))
+        compressed = compress(response.content, encoding, cached)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        return self.mark_encoded(response, encoding)
+
+    @staticmethod
+    def mark_encoded(response, encoding):
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+def profiling_token(user):
+    """Подписанный токен, включающий профилирование запросов"""
+    return signing.dumps(user.pk, salt=PROFILING_SALT)
+
+
+class ProfilingMiddleware:
+    """Профилирование отдельного запроса по подписанному токену.
+
+    Токен передаётся только в заголовке X-Profile (в адресе он попал бы
+    в журналы) и действует, если запрос выполняет тот же сотрудник — по
+    сессии или токену API. tracemalloc общий на процесс, поэтому
+    профилируется один запрос за раз, остальные получают 409. Без
+    токена запрос не замедляется.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.META.get('HTTP_X_PROFILE')
+        user = token and self.staff_user(request, token)
+        if not user:
+            return self.get_response(request)
+        if not _profiling.acquire(blocking=False):
+            return JsonResponse(
+                {'detail': 'Уже профилируется другой запрос, '
+                           'повторите позже'}, status=409)
+        try:
+            return self.profile(request, user)
+        finally:
+            _profiling.release()
+
+    @staticmethod
+    def request_user(request):
+        """Пользователь запроса: из сессии или по токену API"""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user
+        try:
+            authenticated = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        return authenticated and authenticated[0]
+
+    def staff_user(self, request, token):
+        try:
+            user_id = signing.loads(
+                token, salt=PROFILING_SALT,
+                max_age=settings.PROFILING_TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        user = self.request_user(request)
+        if (not user or user.pk != user_id or not user.is_staff
+                or not user.is_active):
+            return None
+        return user
+
+    def profile(self, request, user):
+        queries = []
+
+        def record_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append((time.perf_counter() - start, sql))
+
+        profiler = cProfile.Profile()
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # Пик считается с начала этого запроса; reset_peak — с 3.9
+            getattr(tracemalloc, 'reset_peak', tracemalloc.clear_traces)()
+        else:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_query))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+        _, memory_peak = tracemalloc.get_traced_memory()
+        allocations = tracemalloc.take_snapshot().statistics('lineno')[:20]
+        if not tracing:
+            tracemalloc.stop()
+        report = ProfileReport.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:2000],
+            status=response.status_code,
+            duration=duration,
+            sql_count=len(queries),
+            sql_time=sum(seconds for seconds, _ in queries),
+            memory_peak=memory_peak,
+            report=self.render(request, profiler, allocations, queries),
+        )
+        response['X-Profile-Report'] = str(report.pk)
+        return response
+
+    @staticmethod
+    def render(request, profiler, allocations, queries):
+        output = io.StringIO()
+        output.write(f'{request.method} {request.get_full_path()}\n\n')
+        pstats.Stats(profiler, stream=output).sort_stats(
+            'cumulative').print_stats(60)
+        output.write('Память, крупнейшие выделения:\n')
+        for statistic in allocations:
+            output.write(f'{statistic}\n')
+        output.write(f'\nSQL, запросов: {len(queries)}\n')
+        for seconds, sql in queries:
+            output.write(f'{seconds * 1000:8.2f} мс  {sql}\n')
+        return output.getvalue()
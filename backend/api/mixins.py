@@ -0,0 +1,143 @@
+import hashlib
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+from .caching import generation
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def user_state(user):
+    """Слепок избранного, корзины и подписок пользователя для ETag"""
+    if user.is_anonymous:
+        return ()
+    return (user.pk,) + tuple(
+        tuple(model.objects.filter(user=user).aggregate(
+            Count('id'), Max('id')).values())
+        for model in (Favorite, ShoppingCart, Follow)
+    )
+
+
+class ConditionalRecipeMixin:
+    """Условный GET для рецептов: валидаторы считаются до сериализации"""
+
+    def conditional(self, etag, render, last_modified=None):
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render()
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        response['ETag'] = etag
+        return response
+
+    def list_validators(self):
+        return {'last': Max('updated'), 'total': Count('id')}
+
+    def list(self, request, *args, **kwargs):
+        state = self.filter_queryset(self.get_queryset()).aggregate(
+            **self.list_validators())
+        etag = make_etag(request.get_full_path(), sorted(state.items()),
+                         user_state(request.user))
+        return self.conditional(
+            etag, lambda: super(ConditionalRecipeMixin, self).list(
+                request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        recipe = self.get_object()
+        etag = make_etag(recipe.pk, recipe.updated,
+                         user_state(request.user))
+        last_modified = None
+        if request.user.is_anonymous:
+            last_modified = int(recipe.updated.timestamp())
+        return self.conditional(
+            etag, lambda: Response(self.retrieve_data(recipe)),
+            last_modified)
+
+    def retrieve_data(self, recipe):
+        return self.get_serializer(recipe).data
+
+
+class StreamingListMixin:
+    """Список без пагинации отдаётся потоком JSON.
+
+    Строки читаются через iterator() и сериализуются пачками по
+    STREAM_CHUNK_SIZE, тело ответа байт в байт совпадает с обычным.
+    Если задано поколение list_generation и кэш общий, собранное при
+    потоковой отдаче тело кэшируется, и следующие запросы получают его
+    обычным ответом: сжатая версия тогда тоже берётся из кэша
+    CompressionMiddleware, а не сжимается заново.
+    """
+    list_generation = None
+
+    def can_stream(self):
+        renderer = self.request.accepted_renderer
+        return (settings.STREAM_JSON_LISTS
+                and self.paginator is None
+                and type(renderer) is JSONRenderer
+                and renderer.get_indent(self.request.accepted_media_type,
+                                        self.get_renderer_context()) is None)
+
+    def body_cache_key(self):
+        if self.list_generation is None or not settings.CACHE_SHARED:
+            return None
+        return (f'list-body:{self.list_generation}:'
+                f'{generation(self.list_generation)}')
+
+    def list(self, request, *args, **kwargs):
+        if not self.can_stream():
+            return super().list(request, *args, **kwargs)
+        content_type = request.accepted_renderer.media_type
+        key = self.body_cache_key()
+        body = key and cache.get(key)
+        if body is not None:
+            return HttpResponse(body, content_type=content_type)
+        queryset = self.filter_queryset(self.get_queryset())
+        chunks = self.stream_json(queryset)
+        if key:
+            chunks = self.cache_body(chunks, key)
+        return StreamingHttpResponse(chunks, content_type=content_type)
+
+    @staticmethod
+    def cache_body(chunks, key):
+        """Пропускает поток и кэширует тело, если оно отдано целиком"""
+        body, length = [], 0
+        for chunk in chunks:
+            yield chunk
+            length += len(chunk)
+            if body is not None:
+                body.append(chunk)
+                if length > settings.LIST_BODY_CACHE_MAX_BYTES:
+                    body = None
+        if body is not None:
+            cache.set(key, b''.join(body), settings.API_CACHE_SECONDS)
+
+    def stream_json(self, queryset):
+        renderer = self.request.accepted_renderer
+        media_type = self.request.accepted_media_type
+        context = self.get_renderer_context()
+        rows = queryset.iterator(chunk_size=settings.STREAM_CHUNK_SIZE)
+        opening = b'['
+        while True:
+            chunk = list(islice(rows, settings.STREAM_CHUNK_SIZE))
+            if not chunk:
+                break
+            body = renderer.render(
+                self.get_serializer(chunk, many=True).data,
+                media_type, context)
+            yield opening + body[1:-1]
+            opening = b','
+        yield b'[]' if opening == b'[' else b']'
@@ -0,0 +1,31 @@
+from django.db import models
+
+from users.models import User
+
+
+class ProfileReport(models.Model):
+    """Отчёт профилирования одного запроса"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        verbose_name='Запросил',
+        related_name='profile_reports',
+    )
+    method = models.CharField('Метод', max_length=10)
+    path = models.CharField('Адрес', max_length=2000)
+    status = models.PositiveSmallIntegerField('Код ответа')
+    duration = models.FloatField('Время, с')
+    sql_count = models.PositiveIntegerField('SQL-запросов')
+    sql_time = models.FloatField('Время SQL, с')
+    memory_peak = models.PositiveBigIntegerField('Пик памяти, байт')
+    report = models.TextField('Отчёт')
+    created = models.DateTimeField('Создан', auto_now_add=True)
+
+    class Meta:
+        ordering = ('-id',)
+        verbose_name = 'Отчёт профилирования'
+        verbose_name_plural = 'Отчёты профилирования'
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
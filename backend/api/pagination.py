@@ -1,6 +1,116 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LimitPagePagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+def keyset_ordering(queryset):
+    """Поля сортировки как пары (имя, по убыванию)"""
+    model = queryset.model
+    ordering = []
+    for name in queryset.query.order_by or model._meta.ordering:
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        if name == 'pk':
+            name = model._meta.pk.name
+        if '__' in name or name not in {
+                field.name for field in model._meta.concrete_fields}:
+            raise ValidationError(
+                {'cursor': 'Курсор не поддерживается этой сортировкой'})
+        ordering.append((name, descending))
+    if not ordering or ordering[-1][0] != model._meta.pk.name:
+        raise ValidationError(
+            {'cursor': 'Курсор не поддерживается этой сортировкой'})
+    return ordering
+
+
+def after(ordering, values):
+    """Условие «строго после записи с такими значениями полей»"""
+    condition = None
+    for (name, descending), value in reversed(list(zip(ordering, values))):
+        strict = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+        condition = (strict if condition is None
+                     else strict | Q(**{name: value}) & condition)
+    # Нестрогое сравнение по первому полю задаёт начало просмотра индекса
+    name, descending = ordering[0]
+    return Q(**{f'{name}__{"lte" if descending else "gte"}': values[0]}
+             ) & condition
+
+
+class KeysetPagination(LimitPagePagination):
+    """Страницы по номеру или, с параметром ?cursor=, по ключу сортировки.
+
+    Курсор хранит значения полей сортировки последней записи страницы,
+    следующая страница выбирается условием по ним без OFFSET и COUNT:
+    не съезжает при добавлении рецептов и не замедляется вглубь.
+    """
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.model = queryset.model
+        self.ordering = keyset_ordering(queryset)
+        page_size = self.get_page_size(request)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            queryset = queryset.filter(after(
+                self.ordering, self.decode_cursor(cursor)))
+        # Поля сортировки могут быть отложены через only()
+        queryset = queryset.annotate(**{
+            f'keyset_{name}': F(name) for name, _ in self.ordering})
+        page = list(queryset[:page_size + 1])
+        self.last = page[page_size - 1] if len(page) > page_size else None
+        return page[:page_size]
+
+    def decode_cursor(self, cursor):
+        """Значения полей сортировки, приведённые и проверенные полями"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if (not isinstance(values, list)
+                    or len(values) != len(self.ordering)):
+                raise ValueError(values)
+            return [self.clean_value(name, value)
+                    for (name, _), value in zip(self.ordering, values)]
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound('Неверный курсор')
+
+    def clean_value(self, name, value):
+        if value is None or isinstance(value, (bool, dict, list)):
+            raise TypeError(value)
+        # Границы целых SQLite не входят в валидаторы полей
+        if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+            raise ValueError(value)
+        return self.model._meta.get_field(name).clean(value, None)
+
+    def encode_cursor(self, recipe):
+        values = [getattr(recipe, f'keyset_{name}')
+                  for name, _ in self.ordering]
+        return base64.urlsafe_b64encode(json.dumps(
+            values, ensure_ascii=False).encode()).decode()
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.last is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.last))
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({'next': self.get_next_link(), 'results': data})
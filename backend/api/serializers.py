@@ -1,18 +1,69 @@
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
 from django.db.models import F
-from django.shortcuts import get_object_or_404
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.serializers import (CharField, EmailField, Field,
-                                        IntegerField, ModelSerializer,
+                                        IntegerField, ListSerializer,
+                                        ModelSerializer,
                                         PrimaryKeyRelatedField, ReadOnlyField,
                                         SerializerMethodField, ValidationError)
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 
 from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
                             ShoppingCart, Tag)
+from recipes.similarity import similar_recipes
 from users.models import Follow, User
 
+from .uploads import too_big_message, validate_image
+
+
+def query_names(request, param):
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def sparse_fields(request, names):
+    """Имена полей после ?fields= и ?omit="""
+    fields = query_names(request, 'fields')
+    omit = query_names(request, 'omit') or set()
+    return [name for name in names
+            if (fields is None or name in fields) and name not in omit]
+
+
+def collapsed_fields(request, names):
+    """Вложенные поля, которые не перечислены в ?expand="""
+    expand = query_names(request, 'expand')
+    if expand is None:
+        return set()
+    return {name for name in names if name not in expand}
+
+
+class SparseFieldsMixin:
+    """Урезает поля ответа по параметрам ?fields=, ?omit= и ?expand=.
+
+    Вложенные объекты из collapsed_fields, не названные в ?expand=,
+    заменяются первичными ключами.
+    """
+    collapsed_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        if request is None or parent is not None:
+            return fields
+        for name in collapsed_fields(request, self.collapsed_fields):
+            fields[name] = self.collapsed_fields[name]()
+        return {name: fields[name]
+                for name in sparse_fields(request, fields)}
+
 
 class CreateUserSerializer(UserCreateSerializer):
     """Сериализатор для регистрации"""
@@ -29,7 +80,7 @@ class CreateUserSerializer(UserCreateSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
 
-class UsersSerializer(UserSerializer):
+class UsersSerializer(SparseFieldsMixin, UserSerializer):
     """Сериализатор пользователя"""
     is_subscribed = SerializerMethodField()
 
@@ -41,9 +92,11 @@ class UsersSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         user = self.context.get('request').user
-        if user.is_authenticated:
-            return Follow.objects.filter(user=user, author=obj).exists()
-        return False
+        if user.is_anonymous:
+            return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return Follow.objects.filter(user=user, author=obj).exists()
 
 
 class TagSerializer(ModelSerializer):
@@ -82,7 +135,7 @@ class ReadIngredientsInRecipeSerializer(ModelSerializer):
                   'amount',)
 
 
-class RecipeSerializer(ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, ModelSerializer):
     """Сериализатор для рецептов"""
     author = UsersSerializer(read_only=True)
     ingredients = ReadIngredientsInRecipeSerializer(
@@ -95,6 +148,12 @@ class RecipeSerializer(ModelSerializer):
         method_name='get_is_in_shopping_cart')
     is_favorited = SerializerMethodField()
     image = Base64ImageField()
+    collapsed_fields = {
+        'author': lambda: PrimaryKeyRelatedField(read_only=True),
+        'tags': lambda: PrimaryKeyRelatedField(many=True, read_only=True),
+        'ingredients': lambda: PrimaryKeyRelatedField(many=True,
+                                                      read_only=True),
+    }
 
     class Meta:
         model = Recipe
@@ -102,26 +161,49 @@ class RecipeSerializer(ModelSerializer):
                   'is_favorited', 'is_in_shopping_cart',
                   'name', 'image', 'text', 'cooking_time')
 
+    def to_representation(self, recipe):
+        if hasattr(recipe, 'author_is_subscribed'):
+            recipe.author.is_subscribed = recipe.author_is_subscribed
+        return super().to_representation(recipe)
+
     def get_is_favorited(self, obj) -> Favorite:
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return Favorite.objects.filter(user=request.user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj) -> Favorite:
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return ShoppingCart.objects.filter(
             user=request.user, recipe=obj).exists()
 
 
+class RecipeImageField(Base64ImageField):
+    """Картинка строкой base64 или файлом из multipart/form-data"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return serializers.ImageField.to_internal_value(
+                self, validate_image(data))
+        # Слишком длинная строка отклоняется до декодирования
+        if (isinstance(data, str)
+                and len(data) * 3 // 4 > settings.RECIPE_IMAGE_MAX_BYTES):
+            raise ValidationError(too_big_message())
+        return super().to_internal_value(data)
+
+
 class RecipeCreateSerializer(ModelSerializer):
     """Сериализатор для создания рецептов"""
     ingredients = IngredientCreateSerializer(many=True)
     tags = PrimaryKeyRelatedField(queryset=Tag.objects.all(),
                                   many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
     name = CharField(max_length=200)
     cooking_time = IntegerField()
     author = UserSerializer(read_only=True)
@@ -134,19 +216,19 @@ class RecipeCreateSerializer(ModelSerializer):
 
     @staticmethod
     def create_ingredients(ingredients, recipe):
+        # Существование ингредиентов проверено в validate_ingredients
         for ingredient in ingredients:
             amount = ingredient['amount']
             if IngredientAmount.objects.filter(
                     recipe=recipe,
-                    ingredients=get_object_or_404(
-                        Ingredient, id=ingredient['id'])).exists():
+                    ingredients_id=ingredient['id']).exists():
                 amount += F('amount')
             IngredientAmount.objects.update_or_create(
                 recipe=recipe,
-                ingredients=get_object_or_404(
-                    Ingredient, id=ingredient['id']),
+                ingredients_id=ingredient['id'],
                 defaults={'amount': amount})
 
+    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
@@ -155,8 +237,15 @@ class RecipeCreateSerializer(ModelSerializer):
                                        **validated_data)
         self.create_ingredients(ingredients_data, recipe)
         recipe.tags.set(tags_data)
+        if settings.RECIPE_SIMILARITY_WARNING:
+            self.similar_recipes = [
+                recipe_id for recipe_id, _ in similar_recipes(
+                    recipe.name,
+                    [ingredient['id'] for ingredient in ingredients_data],
+                    exclude=recipe.id)]
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -169,6 +258,8 @@ class RecipeCreateSerializer(ModelSerializer):
         data = RecipeSerializer(
             recipe,
             context={'request': self.context.get('request')}).data
+        if getattr(self, 'similar_recipes', None):
+            data['similar_recipes'] = self.similar_recipes
         return data
 
     def validate_cooking_time(self, cooking_time):
@@ -181,9 +272,29 @@ class RecipeCreateSerializer(ModelSerializer):
             if int(ingredient['amount']) <= 0:
                 raise ValidationError(
                     'Количество ингредиентов должно быть больше 0')
+        ids = {ingredient['id'] for ingredient in ingredients}
+        missing = ids - set(Ingredient.objects.filter(
+            id__in=ids).values_list('id', flat=True))
+        if missing:
+            raise ValidationError('Нет ингредиентов с id {}'.format(
+                ', '.join(map(str, sorted(missing)))))
         return ingredients
 
 
+class RecipeImageSerializer(ModelSerializer):
+    """Сериализатор для замены картинки рецепта"""
+    image = RecipeImageField()
+
+    class Meta:
+        model = Recipe
+        fields = ('image',)
+
+    def to_representation(self, recipe):
+        return RecipeSerializer(
+            recipe,
+            context={'request': self.context.get('request')}).data
+
+
 class RecipeForFollowersSerializer(ModelSerializer):
     """Сериализатор для вывода рецептов в избранном"""
     class Meta:
@@ -195,7 +306,8 @@ class RecipeForFollowersSerializer(ModelSerializer):
 class RecipeFollowUserField(Field):
     """Сериализатор для вывода рецептов в подписках"""
     def get_attribute(self, instance):
-        return Recipe.objects.filter(author=instance.author)
+        return Recipe.objects.filter(author=instance.author,
+                                     is_deleted=False)
 
     def to_representation(self, instance):
         instance = instance['author']
@@ -221,10 +333,14 @@ class FollowSerializer(ModelSerializer):
                   'recipes', 'recipes_count')
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return Recipe.objects.filter(author=obj.author,
+                                     is_deleted=False).count()
 
     def get_is_subscribed(self, obj):
-        return Follow.objects.filter(user=obj.user, author=obj.author).exists()
+        # Сериализуется сама запись подписки, значит подписка есть
+        return True
 
 
 class FavoriteSerializer(ModelSerializer):
@@ -0,0 +1,50 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.deletion import user_soft_deleted
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from recipes.signals import recipes_changed_in_bulk
+
+from .caching import bump_generation
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipes_changed(sender, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        bump_generation('recipes')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(sender, **kwargs):
+    bump_generation('tags')
+
+
+@receiver(user_soft_deleted)
+def author_hidden(sender, **kwargs):
+    # Рецепты автора пропадают из списков, фасетов и списков покупок
+    bump_generation('recipes', 'recipe-ingredients')
+
+
+@receiver(recipes_changed_in_bulk)
+def bulk_recipes_changed(sender, user_ids=(), **kwargs):
+    bump_generation('recipes', 'recipe-ingredients',
+                    *(f'user-recipes:{user_id}' for user_id in user_ids))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    bump_generation('ingredients')
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def recipe_ingredients_changed(sender, **kwargs):
+    bump_generation('recipe-ingredients')
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def user_recipes_changed(sender, instance, **kwargs):
+    bump_generation(f'user-recipes:{instance.user_id}')
@@ -0,0 +1,33 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class BatchTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='user',
+                                        email='user@localhost')
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Текст', cooking_time=10,
+            image='recipes/test.png')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bodies_are_parsed_json(self):
+        response = self.client.post('/api/batch/', {'requests': [
+            {'path': f'/api/recipes/{self.recipe.id}/'},
+            {'path': '/api/recipes/'},
+            {'path': '/api/recipes/0/'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        detail, recipes, missing = response.json()['responses']
+        self.assertEqual(detail['status'], 200)
+        self.assertIsInstance(detail['body'], dict)
+        self.assertEqual(detail['body']['id'], self.recipe.id)
+        self.assertEqual(recipes['status'], 200)
+        self.assertIsInstance(recipes['body'], (dict, list))
+        self.assertEqual(missing['status'], 404)
+        self.assertIsInstance(missing['body'], dict)
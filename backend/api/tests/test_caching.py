@@ -0,0 +1,68 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from api.caching import bump_generation, cached, generation
+
+from backend.testing import local_cache
+
+LOCAL_CACHE = local_cache('api-caching-tests')
+
+
+@override_settings(CACHES=LOCAL_CACHE, CACHE_SHARED=True,
+                   CACHE_LOCK_SECONDS=5)
+class CachedTest(SimpleTestCase):
+    """Потоки одного процесса делят кэш в памяти, как воркеры — общий"""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def compute(self, value='value', seconds=0.2):
+        with self.lock:
+            self.calls += 1
+        time.sleep(seconds)
+        return value
+
+    def test_concurrent_misses_compute_once(self):
+        barrier = threading.Barrier(8)
+        results = []
+
+        def request():
+            barrier.wait()
+            results.append(cached('key', self.compute, 60))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_generation_bump_invalidates(self):
+        def key():
+            return f'list:{generation("items")}'
+
+        self.assertEqual(cached(key(), lambda: self.compute('old', 0), 60),
+                         'old')
+        self.assertEqual(cached(key(), lambda: self.compute('new', 0), 60),
+                         'old')
+        bump_generation('items')
+        self.assertEqual(cached(key(), lambda: self.compute('new', 0), 60),
+                         'new')
+        self.assertEqual(self.calls, 2)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_process_local_cache_is_bypassed(self):
+        for _ in range(3):
+            cached('key', lambda: self.compute(seconds=0), 60)
+        self.assertEqual(self.calls, 3)
+        cached('versioned', lambda: self.compute(seconds=0), 60,
+               versioned=True)
+        cached('versioned', lambda: self.compute(seconds=0), 60,
+               versioned=True)
+        self.assertEqual(self.calls, 4)
@@ -0,0 +1,104 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.caching import generation
+from jobs.models import Job
+from recipes.deletion import purge_recipes, soft_delete_user
+from recipes.models import (Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart)
+from users.models import User
+
+from backend.testing import local_cache
+
+
+def create_recipe(author, ingredient_name):
+    recipe = Recipe.objects.create(author=author, name=ingredient_name,
+                                   text='Текст', cooking_time=10,
+                                   image='recipes/test.png')
+    IngredientAmount.objects.create(
+        recipe=recipe, amount=1, ingredients=Ingredient.objects.create(
+            name=ingredient_name, measurement_unit='г'))
+    return recipe
+
+
+class SoftDeletedAuthorTest(TestCase):
+
+    def test_shopping_cart_hides_deleted_author(self):
+        user = User.objects.create(username='user', email='user@localhost')
+        kept = User.objects.create(username='kept', email='kept@localhost')
+        gone = User.objects.create(username='gone', email='gone@localhost')
+        for recipe in (create_recipe(kept, 'морковь'),
+                       create_recipe(gone, 'свёкла')):
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        client = APIClient()
+        client.force_authenticate(user)
+        url = '/api/recipes/download_shopping_cart/'
+        self.assertContains(client.get(url), 'Свёкла')
+        soft_delete_user(gone)
+        content = client.get(url).content.decode()
+        self.assertIn('Морковь', content)
+        self.assertNotIn('Свёкла', content)
+
+
+@override_settings(CACHES=local_cache('api-deletion-tests'),
+                   CACHE_SHARED=True)
+class AdminRecipeDeleteTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bulk_delete_runs_in_job(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@localhost', password='admin')
+        recipes = [create_recipe(admin, f'продукт {number}').id
+                   for number in range(3)]
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:recipes_recipe_changelist'),
+            {'action': 'delete_selected', '_selected_action': recipes,
+             'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Recipe.objects.count(), 3)
+        job = Job.objects.get(task='recipes.deletion.purge_recipes')
+        self.assertEqual(sorted(job.args[0]), recipes)
+        purge_recipes(*job.args)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_deleted_recipes_are_hidden_at_once(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@localhost', password='admin')
+        kept = create_recipe(admin, 'морковь')
+        gone = create_recipe(admin, 'свёкла')
+        for recipe in (kept, gone):
+            ShoppingCart.objects.create(user=admin, recipe=recipe)
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = '/api/recipes/download_shopping_cart/'
+        self.assertContains(client.get(url), 'Свёкла')
+        before = generation(f'user-recipes:{admin.id}')
+        self.client.force_login(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('admin:recipes_recipe_changelist'),
+                {'action': 'delete_selected', '_selected_action': [gone.id],
+                 'post': 'yes'})
+        self.assertNotEqual(generation(f'user-recipes:{admin.id}'), before)
+        self.assertEqual(client.get(f'/api/recipes/{gone.id}/').status_code,
+                         404)
+        self.assertEqual(
+            [recipe['id'] for recipe in client.get(
+                '/api/recipes/').json()['results']], [kept.id])
+        self.assertNotContains(client.get(url), 'Свёкла')
+
+    def test_purge_bumps_generations(self):
+        user = User.objects.create(username='user', email='user@localhost')
+        recipe = create_recipe(user, 'свёкла')
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+        names = ('recipes', 'recipe-ingredients', f'user-recipes:{user.id}')
+        before = [generation(name) for name in names]
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_recipes([recipe.id])
+        for name, value in zip(names, before):
+            self.assertNotEqual(generation(name), value, name)
@@ -0,0 +1,72 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from users.models import User
+
+
+class RecipeFacetsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='user',
+                                        email='user@localhost')
+        self.first = User.objects.create(username='first',
+                                         email='first@localhost')
+        self.second = User.objects.create(username='second',
+                                          email='second@localhost')
+        self.breakfast = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                            slug='breakfast')
+        self.lunch = Tag.objects.create(name='Обед', color='#49B64E',
+                                        slug='lunch')
+        recipes = [
+            self.create(self.first, self.breakfast, self.lunch),
+            self.create(self.first, self.breakfast),
+            self.create(self.second, self.lunch),
+        ]
+        Favorite.objects.create(user=self.user, recipe=recipes[0])
+        Favorite.objects.create(user=self.first, recipe=recipes[1])
+        ShoppingCart.objects.create(user=self.user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=self.user, recipe=recipes[2])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, author, *tags):
+        recipe = Recipe.objects.create(author=author, name='Рецепт',
+                                       text='Текст', cooking_time=10,
+                                       image='recipes/test.png')
+        recipe.tags.set(tags)
+        return recipe
+
+    def facets(self, query=''):
+        response = self.client.get(f'/api/recipes/facets/{query}')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data, {tag['slug']: tag['count'] for tag in data['tags']}
+
+    def test_counts(self):
+        data, tags = self.facets()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(tags, {'breakfast': 2, 'lunch': 2})
+        self.assertEqual(
+            [(author['username'], author['count'])
+             for author in data['authors']],
+            [('first', 2), ('second', 1)])
+        self.assertEqual(data['is_favorited'], 1)
+        self.assertEqual(data['is_in_shopping_cart'], 2)
+
+    def test_tag_filter_keeps_other_tag_counts(self):
+        data, tags = self.facets('?tags=breakfast')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(tags, {'breakfast': 2, 'lunch': 1})
+        self.assertEqual(data['is_in_shopping_cart'], 1)
+
+    def test_authors_limited_in_sql(self):
+        with self.settings(FACETS_AUTHORS_LIMIT=1):
+            with CaptureQueriesContext(connection) as queries:
+                data, _ = self.facets()
+        self.assertEqual([author['username'] for author in data['authors']],
+                         ['first'])
+        self.assertTrue(any(
+            'LIMIT 1' in query['sql'] for query in queries.captured_queries))
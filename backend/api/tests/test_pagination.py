@@ -0,0 +1,60 @@
+import base64
+import json
+
+from django.test import TestCase
+
+from recipes.models import Recipe
+from users.models import User
+
+
+def cursor(*values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class KeysetPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username='cook', email='cook@localhost',
+                                     first_name='Повар', last_name='Повар')
+        for number in range(5):
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Текст',
+                cooking_time=number + 1, image='recipes/cursor.png')
+
+    def get(self, **params):
+        return self.client.get('/api/recipes/', {'limit': 2, **params})
+
+    def test_pages_follow_cursor(self):
+        names, params = [], {'cursor': '', 'ordering': 'cooking_time'}
+        while True:
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 200)
+            names += [recipe['name'] for recipe in response.json()['results']]
+            link = response.json()['next']
+            if link is None:
+                break
+            params['cursor'] = link.split('cursor=')[1].split('&')[0]
+        self.assertEqual(names, [f'Рецепт {number}' for number in range(5)])
+
+    def test_invalid_cursor_values(self):
+        cases = (
+            ({}, cursor('abc')),
+            ({}, cursor(None)),
+            ({}, cursor({'x': 1})),
+            ({}, cursor(True)),
+            ({}, cursor(1, 2)),
+            ({}, 'not base64!'),
+            ({'ordering': 'cooking_time'}, cursor('abc', 1)),
+            ({'ordering': 'cooking_time'}, cursor({'x': 1}, 1)),
+            ({'ordering': 'cooking_time'}, cursor(1, 'zz')),
+            ({'ordering': 'cooking_time'}, cursor(10 ** 30, 1)),
+            ({'ordering': 'name'}, cursor(['a'], 1)),
+            ({'ordering': 'name'}, cursor(None, 1)),
+        )
+        for params, value in cases:
+            with self.subTest(params=params, cursor=value):
+                response = self.get(cursor=value, **params)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()['detail'],
+                                 'Неверный курсор')
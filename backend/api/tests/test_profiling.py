@@ -0,0 +1,42 @@
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+
+from api import middleware
+from api.middleware import profiling_token
+from api.models import ProfileReport
+from users.models import User
+
+
+class ProfilingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create(
+            username='staff', email='staff@localhost', is_staff=True)
+        self.auth = f'Token {Token.objects.create(user=self.staff).key}'
+        self.token = profiling_token(self.staff)
+
+    def get(self, path='/api/tags/', **headers):
+        return self.client.get(path, **headers)
+
+    def test_staff_request_is_profiled(self):
+        response = self.get(HTTP_AUTHORIZATION=self.auth,
+                            HTTP_X_PROFILE=self.token)
+        report = ProfileReport.objects.get()
+        self.assertEqual(response['X-Profile-Report'], str(report.pk))
+        self.assertGreater(report.memory_peak, 0)
+
+    def test_token_requires_same_authenticated_staff(self):
+        other = User.objects.create(username='other', email='o@localhost')
+        other_auth = f'Token {Token.objects.create(user=other).key}'
+        self.get(HTTP_X_PROFILE=self.token)
+        self.get(HTTP_AUTHORIZATION=other_auth, HTTP_X_PROFILE=self.token)
+        self.get(f'/api/tags/?_profile={self.token}',
+                 HTTP_AUTHORIZATION=self.auth)
+        self.assertFalse(ProfileReport.objects.exists())
+
+    def test_concurrent_profile_gets_conflict(self):
+        with middleware._profiling:
+            response = self.get(HTTP_AUTHORIZATION=self.auth,
+                                HTTP_X_PROFILE=self.token)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(ProfileReport.objects.exists())
@@ -0,0 +1,104 @@
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, RecipeSignature, Tag
+from recipes.signals import SignatureUpdate
+from users.models import User
+
+from backend.testing import local_cache, pixel
+
+
+class RecipeIngredientsTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        user = User.objects.create(username='cook', email='cook@localhost',
+                                   first_name='Повар', last_name='Повар')
+        self.client.defaults['HTTP_AUTHORIZATION'] = (
+            f'Token {Token.objects.create(user=user).key}')
+        self.tag = Tag.objects.create(name='Завтрак', color='#FFAA00',
+                                      slug='breakfast')
+        self.salt = Ingredient.objects.create(name='соль',
+                                              measurement_unit='г')
+        self.sugar = Ingredient.objects.create(name='сахар',
+                                               measurement_unit='г')
+
+    def create(self, *ingredients):
+        return self.client.post('/api/recipes/', {
+            'name': 'Каша', 'text': 'Варить', 'cooking_time': 10,
+            'image': pixel(), 'tags': [self.tag.id],
+            'ingredients': [{'id': ingredient, 'amount': 1}
+                            for ingredient in ingredients]},
+            content_type='application/json')
+
+    def test_deleted_ingredient(self):
+        deleted = self.sugar.id
+        self.sugar.delete()
+        response = self.create(self.salt.id, deleted)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(deleted), str(response.json()['ingredients']))
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_existing_ingredients(self):
+        response = self.create(self.salt.id, self.sugar.id)
+        self.assertEqual(response.status_code, 201)
+
+    def test_one_signature_update_per_recipe(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.create(self.salt.id, self.sugar.id)
+        self.assertEqual(response.status_code, 201)
+        updates = [callback for callback in callbacks
+                   if isinstance(callback, SignatureUpdate)]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(updates[0].recipe_ids, {response.json()['id']})
+        updates[0]()
+        self.assertTrue(RecipeSignature.objects.filter(
+            recipe_id=response.json()['id']).exists())
+
+
+@override_settings(CACHES=local_cache('api-recipes-tests'),
+                   CACHE_SHARED=True)
+class RecipeDetailFreshnessTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(
+            username='cook', email='cook@localhost', first_name='Повар',
+            last_name='Повар')
+        self.tag = Tag.objects.create(name='Завтрак', color='#FFAA00',
+                                      slug='breakfast')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Каша', text='Варить', cooking_time=10,
+            image='recipes/test.png')
+        self.recipe.tags.add(self.tag)
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def get(self, etag=None):
+        headers = {} if etag is None else {'HTTP_IF_NONE_MATCH': etag}
+        return self.client.get(self.url, **headers)
+
+    def test_deleted_tag_changes_detail(self):
+        first = self.get()
+        self.assertEqual(len(first.json()['tags']), 1)
+        self.tag.delete()
+        self.assertEqual(self.get(first['ETag']).status_code, 200)
+        self.assertEqual(self.get().json()['tags'], [])
+
+    def test_renamed_author_changes_detail(self):
+        first = self.get()
+        self.author.first_name = 'Шеф'
+        self.author.save()
+        self.assertEqual(self.get(first['ETag']).status_code, 200)
+        self.assertEqual(self.get().json()['author']['first_name'], 'Шеф')
+
+    def test_login_keeps_etag(self):
+        first = self.get()
+        self.author.save(update_fields=['last_login'])
+        self.assertEqual(self.get(first['ETag']).status_code, 304)
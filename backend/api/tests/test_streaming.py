@@ -0,0 +1,71 @@
+import gzip
+import json
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from recipes.models import Tag
+
+from backend.testing import local_cache
+
+LOCAL_CACHE = local_cache('api-streaming-tests')
+
+
+@override_settings(CACHES=LOCAL_CACHE, CACHE_SHARED=True,
+                   STREAM_JSON_LISTS=True, COMPRESSION_MIN_LENGTH=0)
+class StreamingListCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for number in range(3):
+            Tag.objects.create(name=f'Тэг {number}', color=f'#00000{number}',
+                               slug=f'tag-{number}')
+
+    def get(self, **headers):
+        response = self.client.get('/api/tags/', **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_full_list_is_streamed_once(self):
+        first = self.get()
+        self.assertTrue(first.streaming)
+        body = b''.join(first.streaming_content)
+        with self.assertNumQueries(0):
+            second = self.get()
+        self.assertFalse(second.streaming)
+        self.assertEqual(second.content, body)
+        self.assertEqual(len(json.loads(body)), 3)
+
+    def test_cached_body_is_compressed_once(self):
+        b''.join(self.get().streaming_content)
+        first = self.get(HTTP_ACCEPT_ENCODING='gzip')
+        second = self.get(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertFalse(second.streaming)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(len(json.loads(gzip.decompress(second.content))),
+                         3)
+
+    def test_tag_change_invalidates_body(self):
+        b''.join(self.get().streaming_content)
+        Tag.objects.create(name='Новый', color='#000009', slug='new')
+        response = self.get()
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            len(json.loads(b''.join(response.streaming_content))), 4)
+
+    @override_settings(LIST_BODY_CACHE_MAX_BYTES=10)
+    def test_large_body_is_not_cached(self):
+        b''.join(self.get().streaming_content)
+        self.assertTrue(self.get().streaming)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_local_cache_always_streams(self):
+        # Без общего кэша тело не кэшируется, и кэш сжатых ответов
+        # CompressionMiddleware к спискам не применяется
+        for _ in range(2):
+            response = self.get(HTTP_ACCEPT_ENCODING='gzip')
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(len(json.loads(gzip.decompress(
+                b''.join(response.streaming_content)))), 3)
@@ -0,0 +1,114 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from api.throttling import CostThrottle
+
+from backend.testing import local_cache
+
+LOCAL_CACHE = local_cache('api-throttling-tests')
+
+
+class CostView(APIView):
+    authentication_classes = ()
+    permission_classes = ()
+    throttle_classes = (CostThrottle,)
+
+    def get_throttle_cost(self, request):
+        return 4 if request.method == 'POST' else 1
+
+    def get(self, request):
+        return Response()
+
+    def post(self, request):
+        return Response()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(CACHES=LOCAL_CACHE, THROTTLE_COST_BYTES=1024)
+class CostThrottleTest(SimpleTestCase):
+    """Ведро на 60 токенов, пополнение — токен в секунду"""
+
+    def setUp(self):
+        cache.clear()
+        self.clock = Clock()
+        self.factory = APIRequestFactory()
+        self.view = CostView.as_view()
+        for patcher in (
+                mock.patch.object(CostThrottle, 'timer', self.clock),
+                mock.patch.object(CostThrottle, 'THROTTLE_RATES',
+                                  {'anon_cost': '60/min'})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get(self, ip='10.0.0.1'):
+        return self.view(self.factory.get('/', REMOTE_ADDR=ip))
+
+    def post(self, body=b''):
+        request = self.factory.post('/', body, content_type='text/plain',
+                                    REMOTE_ADDR='10.0.0.1')
+        request.method = 'POST'
+        return self.view(request)
+
+    def test_bucket_refills_over_time(self):
+        for _ in range(60):
+            self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(self.get().status_code, 429)
+        self.clock.now += 0.5
+        self.assertEqual(self.get().status_code, 429)
+        self.clock.now += 0.5
+        self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(self.get().status_code, 429)
+        self.clock.now += 600
+        for _ in range(60):
+            self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(self.get().status_code, 429)
+
+    def test_cost_includes_view_cost_and_body(self):
+        for _ in range(52):
+            self.get()
+        self.assertEqual(self.post(b'x' * 2048).status_code, 200)
+        self.assertEqual(self.post().status_code, 429)
+        for _ in range(2):
+            self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(self.get().status_code, 429)
+
+    def test_retry_after(self):
+        for _ in range(60):
+            self.get()
+        self.clock.now += 1
+        response = self.post()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3')
+        self.clock.now += 3
+        self.assertEqual(self.post().status_code, 200)
+
+    def test_forwarded_for_separates_clients(self):
+        for _ in range(60):
+            self.view(self.factory.get(
+                '/', HTTP_X_FORWARDED_FOR='1.1.1.1', REMOTE_ADDR='10.0.0.9'))
+        response = self.view(self.factory.get(
+            '/', HTTP_X_FORWARDED_FOR='1.1.1.1', REMOTE_ADDR='10.0.0.9'))
+        self.assertEqual(response.status_code, 429)
+        response = self.view(self.factory.get(
+            '/', HTTP_X_FORWARDED_FOR='2.2.2.2', REMOTE_ADDR='10.0.0.9'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_held_lock_is_waited_for(self):
+        key = 'throttle:anon_cost:10.0.0.1'
+        cache.add(f'lock:{key}', True, 1)
+        with mock.patch('api.throttling.time.sleep',
+                        side_effect=lambda _: cache.delete(f'lock:{key}')):
+            self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(cache.get(key)[0], 59)
@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+LOCK_WAIT_SECONDS = 0.005
+
+
+class CostThrottle(SimpleRateThrottle):
+    """Ограничение запросов «ведром токенов» с ценой запроса.
+
+    Ведро на пользователя (или IP для анонимов) вмещает столько токенов,
+    сколько разрешено скоростью user_cost или anon_cost, и равномерно
+    пополняется за её период. Запрос стоит throttle_costs[action] вьюсета
+    (по умолчанию 1) плюс токен за каждые THROTTLE_COST_BYTES тела.
+    Ведра лежат в кэше, общем для воркеров при CACHE_LOCATION (memcached);
+    чтение и запись ведра идут под блокировкой cache.add, чтобы
+    параллельные запросы не тратили одни и те же токены.
+    """
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        pass
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    @staticmethod
+    def get_cost(request, view):
+        if hasattr(view, 'get_throttle_cost'):
+            cost = view.get_throttle_cost(request)
+        else:
+            cost = getattr(view, 'throttle_costs', {}).get(
+                getattr(view, 'action', None), 1)
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        return cost + length // settings.THROTTLE_COST_BYTES
+
+    def allow_request(self, request, view):
+        self.scope = ('user_cost' if request.user.is_authenticated
+                      else 'anon_cost')
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.capacity, duration = self.parse_rate(self.rate)
+        self.refill = self.capacity / duration
+        self.cost = min(self.get_cost(request, view), self.capacity)
+        self.key = self.get_cache_key(request, view)
+        lock_key = f'lock:{self.key}'
+        locked = self.acquire(lock_key)
+        try:
+            now = self.timer()
+            tokens, updated = self.cache.get(self.key, (self.capacity, now))
+            self.tokens = min(self.capacity,
+                              tokens + (now - updated) * self.refill)
+            if self.tokens < self.cost:
+                return False
+            self.cache.set(self.key, (self.tokens - self.cost, now),
+                           duration)
+            return True
+        finally:
+            if locked:
+                self.cache.delete(lock_key)
+
+    def acquire(self, lock_key):
+        """Берёт блокировку ведра; False, если не дождались"""
+        timeout = settings.THROTTLE_LOCK_SECONDS
+        deadline = time.monotonic() + timeout
+        while not self.cache.add(lock_key, True, timeout):
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(LOCK_WAIT_SECONDS)
+        return True
+
+    def wait(self):
+        return (self.cost - self.tokens) / self.refill
@@ -0,0 +1,80 @@
+"""Загрузка картинок рецептов через multipart/form-data.
+
+Файл пишется во временный файл частями по мере чтения запроса, а не
+собирается в памяти; загрузка прерывается, как только файл превысил
+RECIPE_IMAGE_MAX_BYTES. Формат и размеры картинки проверяются по
+заголовку, без декодирования пикселей.
+"""
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import (FileUploadHandler,
+                                             TemporaryFileUploadHandler)
+from django.http.multipartparser import MultiPartParserError
+from PIL import Image, UnidentifiedImageError
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+
+
+def too_big_message():
+    return (f'Картинка больше '
+            f'{settings.RECIPE_IMAGE_MAX_BYTES // 2 ** 20} МБ')
+
+
+class ImageSizeLimitHandler(FileUploadHandler):
+    """Прерывает разбор запроса, как только файл превысил лимит"""
+
+    def handle_raw_input(self, input_data, meta, content_length, boundary,
+                         encoding=None):
+        # Кроме файла в теле только небольшие поля формы
+        if content_length > (settings.RECIPE_IMAGE_MAX_BYTES
+                             + settings.DATA_UPLOAD_MAX_MEMORY_SIZE):
+            raise MultiPartParserError(too_big_message())
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_BYTES:
+            raise MultiPartParserError(too_big_message())
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class ImageMultiPartParser(MultiPartParser):
+    """multipart/form-data с потоковой записью файлов на диск"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        request._request.upload_handlers = [
+            ImageSizeLimitHandler(request._request),
+            TemporaryFileUploadHandler(request._request),
+        ]
+        return super().parse(stream, media_type, parser_context)
+
+
+def validate_image(upload):
+    """Проверяет размер, формат и размеры загруженной картинки.
+
+    Pillow читает только заголовок файла; имя файла получает расширение
+    по настоящему формату.
+    """
+    if upload.size > settings.RECIPE_IMAGE_MAX_BYTES:
+        raise ValidationError(too_big_message())
+    try:
+        with Image.open(upload) as image:
+            image_format, size = image.format, image.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError('Загрузите корректную картинку')
+    finally:
+        upload.seek(0)
+    if image_format not in IMAGE_FORMATS:
+        raise ValidationError('Поддерживаются только JPEG, PNG и GIF')
+    if max(size) > settings.RECIPE_IMAGE_MAX_SIDE:
+        raise ValidationError(
+            f'Картинка больше {settings.RECIPE_IMAGE_MAX_SIDE} точек '
+            f'по стороне')
+    name = os.path.splitext(os.path.basename(upload.name or 'image'))[0]
+    upload.name = f'{name}.{IMAGE_FORMATS[image_format]}'
+    return upload
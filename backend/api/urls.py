@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UsersViewSet
+from .views import (BatchView, ChangesViewSet, IngredientViewSet,
+                    RecipeViewSet, TagViewSet, UsersViewSet)
 
 app_name = 'api'
 
@@ -11,9 +12,11 @@ router.register('users', UsersViewSet, basename='users')
 router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
+router.register('changes', ChangesViewSet, basename='changes')
 
 
 urlpatterns = [
+    path('batch/', BatchView.as_view(), name='batch'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,24 +1,49 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import hashlib
+import io
+import json
+import logging
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.db.models import (Count, Exists, Max, OuterRef, Prefetch, Q,
+                              Sum)
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import Resolver404, resolve
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.parsers import FormParser, JSONParser
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from recipes.deletion import soft_delete_user
+from recipes.models import (Change, Favorite, Ingredient, IngredientAmount,
+                            Recipe, ShoppingCart, Tag)
+from recipes.ndjson import export_recipes
 from users.models import Follow, User
-from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                            ShoppingCart, Tag)
+
+from .caching import cached, generation
+from .facets import recipe_facets
 from .filters import IngredientSearchFilter, RecipesFilter
-from .pagination import LimitPagePagination
+from .mixins import ConditionalRecipeMixin, StreamingListMixin
+from .pagination import KeysetPagination, LimitPagePagination
 from .permissions import AdminOrAuthor, AdminOrReadOnly
 from .serializers import (FavoriteSerializer, FollowSerializer,
                           IngredientSerializer, RecipeCreateSerializer,
-                          RecipeForFollowersSerializer, RecipeSerializer,
+                          RecipeForFollowersSerializer,
+                          RecipeImageSerializer, RecipeSerializer,
                           ShoppingCartSerializer, TagSerializer,
-                          UsersSerializer)
+                          UsersSerializer, collapsed_fields, sparse_fields)
+from .uploads import ImageMultiPartParser
 
 
 class UsersViewSet(UserViewSet):
@@ -27,9 +52,29 @@ class UsersViewSet(UserViewSet):
     serializer_class = UsersSerializer
     pagination_class = LimitPagePagination
     filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
-    search_fields = ('username', 'email')
+    search_fields = ('^username', '^email')
     permission_classes = (AllowAny, )
 
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(is_deleted=False)
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        fields = sparse_fields(self.request, UsersSerializer.Meta.fields)
+        user = self.request.user
+        if user.is_authenticated and 'is_subscribed' in fields:
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('pk'))))
+        return queryset.only('id', *(set(fields) - {'is_subscribed'}))
+
+    def get_instance(self):
+        user = self.request.user
+        # На себя подписаться нельзя, запрос в базу не нужен
+        user.is_subscribed = False
+        return user
+
+    def perform_destroy(self, instance):
+        soft_delete_user(instance)
+
     def subscribed(self, serializer, id=None):
         follower = get_object_or_404(User, id=id)
         if self.request.user == follower:
@@ -57,21 +102,29 @@ class UsersViewSet(UserViewSet):
     @action(detail=False, methods=['get'],
             permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, serializer):
-        following = Follow.objects.filter(user=self.request.user)
+        recipes = Recipe.objects.filter(is_deleted=False).only(
+            'id', 'name', 'image', 'cooking_time', 'author')
+        following = Follow.objects.filter(
+            user=self.request.user, author__is_deleted=False).select_related(
+                'author').prefetch_related(
+                    Prefetch('author__recipes', recipes)).annotate(
+                        recipes_count=Count('author__recipes', filter=Q(
+                            author__recipes__is_deleted=False)))
         pages = self.paginate_queryset(following)
         serializer = FollowSerializer(pages, many=True)
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """Вьюсет для модели тэгов"""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (AdminOrReadOnly,)
+    list_generation = 'tags'
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(StreamingListMixin, viewsets.ModelViewSet):
     """Вьюсет для модели ингредиентов"""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -79,21 +132,140 @@ class IngredientViewSet(viewsets.ModelViewSet):
     pagination_class = None
     filter_backends = (IngredientSearchFilter,)
     search_fields = ('^name',)
+    list_generation = 'ingredients'
+
+    def get_throttle_cost(self, request):
+        if self.action == 'list' and not request.query_params.get(
+                IngredientSearchFilter.search_param):
+            return 5
+        return 1
 
+    def can_stream(self):
+        return super().can_stream() and not self.request.query_params.get(
+            IngredientSearchFilter.search_param)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        if self.can_stream():
+            return super().list(request, *args, **kwargs)
+        name = request.query_params.get(IngredientSearchFilter.search_param,
+                                        '')
+        digest = hashlib.sha1(name.encode()).hexdigest()
+        key = f'ingredients:{generation("ingredients")}:{digest}'
+        return Response(cached(
+            key, lambda: super(IngredientViewSet, self).list(
+                request, *args, **kwargs).data,
+            settings.API_CACHE_SECONDS))
+
+
+class RecipeViewSet(ConditionalRecipeMixin, viewsets.ModelViewSet):
     """Вьюсет рецептов"""
     queryset = Recipe.objects.all()
     permission_classes = (AdminOrAuthor,)
-    pagination_class = LimitPagePagination
+    pagination_class = KeysetPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipesFilter
+    parser_classes = (JSONParser, FormParser, ImageMultiPartParser)
+    throttle_costs = {
+        'create': 5,
+        'update': 5,
+        'partial_update': 5,
+        'image': 5,
+        'facets': 3,
+        'download_shopping_cart': 10,
+        'export': 50,
+    }
+
+    def list_validators(self):
+        validators = super().list_validators()
+        if self.request.query_params.get('ordering') == 'trending':
+            validators['trending'] = Max('trending__updated')
+        return validators
+
+    def requested_fields(self):
+        fields = set(sparse_fields(self.request,
+                                   RecipeSerializer.Meta.fields))
+        collapsed = collapsed_fields(self.request,
+                                     RecipeSerializer.collapsed_fields)
+        return fields, collapsed
+
+    def get_queryset(self):
+        queryset = Recipe.objects.filter(author__is_deleted=False,
+                                         is_deleted=False)
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        fields, collapsed = self.requested_fields()
+        user = self.request.user
+        if user.is_authenticated and 'is_favorited' in fields:
+            queryset = queryset.annotate(is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))))
+        if user.is_authenticated and 'is_in_shopping_cart' in fields:
+            queryset = queryset.annotate(is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user,
+                                            recipe=OuterRef('pk'))))
+        if self.action == 'retrieve':
+            # Связанные данные загружаются в retrieve_data при промахе кэша
+            return queryset.only('id', 'updated', 'author')
+        if (user.is_authenticated and 'author' in fields
+                and 'author' not in collapsed):
+            queryset = queryset.annotate(author_is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('author'))))
+        return self.with_related(queryset, fields, collapsed)
+
+    def with_related(self, queryset, fields, collapsed):
+        columns = {'id', 'updated'} | fields & {
+            'name', 'image', 'text', 'cooking_time'}
+        if 'author' in fields:
+            columns.add('author')
+            if 'author' not in collapsed:
+                queryset = queryset.select_related('author')
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'tags', Tag.objects.only('id') if 'tags' in collapsed
+                else Tag.objects.all()))
+        if 'ingredients' in collapsed:
+            queryset = queryset.prefetch_related(Prefetch(
+                'ingredients', Ingredient.objects.only('id')))
+        elif 'ingredients' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'amount_ingredient',
+                IngredientAmount.objects.select_related('ingredients')))
+        return queryset.only(*columns)
+
+    def retrieve_data(self, recipe):
+        """Рецепт из общего кэша с флагами текущего пользователя"""
+        fields, collapsed = self.requested_fields()
+        query = hashlib.sha1(repr(sorted(fields | {
+            f'{name}:collapsed' for name in collapsed})).encode())
+        key = (f'recipe:{recipe.pk}:{recipe.updated.timestamp()}:'
+               f'{query.hexdigest()}')
+
+        def render():
+            full = self.with_related(
+                Recipe.objects.filter(pk=recipe.pk), fields, collapsed).get()
+            if 'author' in fields and 'author' not in collapsed:
+                # Подписка зависит от пользователя и подставляется ниже
+                full.author.is_subscribed = False
+            return dict(self.get_serializer(full).data)
+
+        data = dict(cached(key, render, settings.API_CACHE_SECONDS,
+                           versioned=True))
+        user = self.request.user
+        for flag in ('is_favorited', 'is_in_shopping_cart'):
+            if flag in data:
+                data[flag] = bool(getattr(recipe, flag, False))
+        if isinstance(data.get('author'), dict):
+            data['author'] = {**data['author'], 'is_subscribed': (
+                user.is_authenticated and Follow.objects.filter(
+                    user=user, author_id=recipe.author_id).exists())}
+        return data
 
     def get_serializer_class(self):
         if self.action == 'list':
             return RecipeSerializer
         if self.action == 'retrieve':
             return RecipeSerializer
+        if self.action == 'image':
+            return RecipeImageSerializer
         return RecipeCreateSerializer
 
     def perform_create(self, serializer):
@@ -118,6 +290,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         objects.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=True, methods=['put'],
+            parser_classes=(ImageMultiPartParser,))
+    def image(self, request, pk):
+        """Замена картинки файлом из поля image формы multipart"""
+        serializer = self.get_serializer(self.get_object(),
+                                         data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
     @action(
         detail=True,
         methods=('POST', 'DELETE'),
@@ -145,12 +327,221 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def download_shopping_cart(self, request):
         user = request.user
+        key = 'shopping-cart:{}:{}:{}:{}'.format(
+            user.pk, generation(f'user-recipes:{user.pk}'),
+            generation('recipe-ingredients'), generation('ingredients'))
+        shopping_cart = cached(
+            key, lambda: self.shopping_cart_text(user),
+            settings.API_CACHE_SECONDS)
+        response = HttpResponse(shopping_cart, content_type='text/plain')
+        return response
+
+    @staticmethod
+    def shopping_cart_text(user):
         ingredients_list = IngredientAmount.objects.filter(
-            recipe__shopping_cart__user=user).values_list(
+            recipe__shopping_cart__user=user,
+            recipe__author__is_deleted=False,
+            recipe__is_deleted=False).values_list(
                 'ingredients__name', 'ingredients__measurement_unit').annotate(
                     Sum('amount')).order_by()
         shopping_cart = 'Список покупок:\n'
         for name, measure, amount in ingredients_list:
             shopping_cart += (f'{name.capitalize()} {amount} {measure},\n')
-        response = HttpResponse(shopping_cart, content_type='text/plain')
-        return response
+        return shopping_cart
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        user = request.user
+        params = sorted(
+            (name, sorted(request.query_params.getlist(name)))
+            for name in RecipesFilter.get_filters()
+            if name in request.query_params)
+        parts = [generation('recipes')]
+        if user.is_authenticated:
+            parts += [user.pk, generation(f'user-recipes:{user.pk}')]
+        key = 'facets:{}:{}'.format(
+            ':'.join(map(str, parts)),
+            hashlib.sha1(repr(params).encode()).hexdigest())
+        facets = cache.get(key) if settings.CACHE_SHARED else None
+        if facets is None:
+            tags = cached(
+                f'facets-tags:{parts[0]}',
+                lambda: list(Tag.objects.values('id', 'name', 'slug')),
+                settings.FACETS_CACHE_SECONDS)
+            facets = recipe_facets(
+                self.filter_queryset(self.get_queryset()), tags, user,
+                settings.FACETS_AUTHORS_LIMIT)
+            if settings.CACHE_SHARED:
+                cache.set(key, facets, settings.FACETS_CACHE_SECONDS)
+        return Response(facets)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(IsAdminUser,))
+    def export(self, request):
+        return StreamingHttpResponse(
+            export_recipes(self.filter_queryset(self.get_queryset())),
+            content_type='application/x-ndjson')
+
+
+def coalesce_changes(rows):
+    """Сводит записи журнала к итоговому действию по каждому объекту"""
+    first, last = {}, {}
+    for collection, object_id, change in rows:
+        first.setdefault((collection, object_id), change)
+        last[(collection, object_id)] = change
+    result = {collection: {change: [] for change, _ in Change.ACTIONS}
+              for collection, _ in Change.COLLECTIONS}
+    for (collection, object_id), change in last.items():
+        existed = first[(collection, object_id)] != Change.CREATED
+        if change == Change.DELETED and not existed:
+            continue
+        if change != Change.DELETED:
+            change = Change.UPDATED if existed else Change.CREATED
+        result[collection][change].append(object_id)
+    return result
+
+
+class ChangesViewSet(viewsets.ViewSet):
+    """Вьюсет журнала изменений для синхронизации клиентов"""
+    permission_classes = (AllowAny,)
+
+    def list(self, request):
+        settled = Change.objects.filter(
+            created__lte=timezone.now() - timedelta(
+                seconds=settings.CHANGES_SETTLE_SECONDS))
+        latest = settled.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'token': str(latest)})
+        try:
+            since = int(since)
+        except ValueError:
+            return Response({'errors': 'Неверный токен синхронизации'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        oldest = Change.objects.order_by('id').values_list(
+            'id', flat=True).first()
+        if since > latest or oldest is not None and since < oldest - 1:
+            return Response({'resync_required': True, 'token': str(latest)},
+                            status=status.HTTP_410_GONE)
+        visible = Q(user__isnull=True)
+        if request.user.is_authenticated:
+            visible |= Q(user=request.user)
+        rows = list(settled.filter(
+            visible, id__gt=since, id__lte=latest).values_list(
+                'id', 'collection', 'object_id', 'action')[
+                    :settings.CHANGES_PAGE_SIZE])
+        return Response({
+            'token': str(rows[-1][0] if rows else latest),
+            'has_more': len(rows) == settings.CHANGES_PAGE_SIZE,
+            **coalesce_changes(row[1:] for row in rows),
+        })
+
+
+class BatchView(APIView):
+    """Несколько запросов к API за один.
+
+    Подзапросы выполняются по очереди внутри процесса, с пользователем
+    внешнего запроса и тем же соединением с базой. Если среди них есть
+    изменяющие, все выполняются в одной транзакции, а после первой
+    ошибки остальные пропускаются со статусом 424.
+    """
+    permission_classes = (AllowAny,)
+    write_methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+    shared_meta = ('HTTP_HOST', 'HTTP_X_FORWARDED_FOR',
+                   'HTTP_X_FORWARDED_PROTO', 'HTTP_ACCEPT_LANGUAGE',
+                   'HTTP_USER_AGENT', 'REMOTE_ADDR', 'SERVER_NAME',
+                   'SERVER_PORT', 'wsgi.url_scheme')
+
+    def post(self, request):
+        items = request.data.get('requests') if isinstance(
+            request.data, dict) else None
+        error = self.validate(items)
+        if error:
+            return Response({'errors': error},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not any(item['method'] in self.write_methods for item in items):
+            return Response({'responses': [
+                self.dispatch_item(request, item) for item in items]})
+        responses = []
+        with transaction.atomic():
+            for item in items:
+                if responses and responses[-1]['status'] >= 400:
+                    responses.append({
+                        'status': status.HTTP_424_FAILED_DEPENDENCY,
+                        'body': None})
+                    continue
+                responses.append(self.dispatch_item(request, item))
+            if responses[-1]['status'] >= 400:
+                transaction.set_rollback(True)
+        return Response({'responses': responses})
+
+    def validate(self, items):
+        if not isinstance(items, list) or not items:
+            return 'Ожидается непустой список requests'
+        if len(items) > settings.BATCH_MAX_REQUESTS:
+            return (f'Не больше {settings.BATCH_MAX_REQUESTS} '
+                    f'запросов в пакете')
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(
+                    item.get('path'), str):
+                return 'У каждого запроса должен быть path'
+            item['method'] = str(item.get('method', 'GET')).upper()
+            if item['method'] not in ('GET',) + self.write_methods:
+                return f'Метод {item["method"]} не поддерживается'
+            path = urlsplit(item['path']).path
+            if not path.startswith('/api/') or path.startswith(
+                    '/api/batch/'):
+                return f'Недопустимый путь {item["path"]}'
+        return None
+
+    def dispatch_item(self, request, item):
+        url = urlsplit(item['path'])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return {'status': status.HTTP_404_NOT_FOUND, 'body': None}
+        body = b''
+        if item.get('body') is not None:
+            body = json.dumps(item['body']).encode()
+        environ = {
+            key: value for key, value in request.META.items()
+            if key in self.shared_meta
+        }
+        sub = WSGIRequest({
+            **environ,
+            'REQUEST_METHOD': item['method'],
+            # WSGI передаёт байты запроса строками latin-1
+            'PATH_INFO': url.path.encode().decode('latin-1'),
+            'QUERY_STRING': url.query.encode().decode('latin-1'),
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_ACCEPT': 'application/json',
+            'wsgi.input': io.BytesIO(body),
+        })
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+        sub.resolver_match = match
+        try:
+            response = match.func(sub, *match.args, **match.kwargs)
+        except Exception:
+            logging.getLogger('django.request').exception(
+                'Ошибка в подзапросе %s %s', item['method'], item['path'])
+            return {'status': status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    'body': None}
+        if hasattr(response, 'render'):
+            # Content-Type ответа DRF появляется только при рендеринге
+            response.render()
+        is_json = response.get('Content-Type', '').startswith(
+            'application/json')
+        if response.streaming and not is_json:
+            return {'status': status.HTTP_400_BAD_REQUEST,
+                    'body': {'errors': 'Потоковый ответ недоступен '
+                                       'в пакете'}}
+        if response.streaming:
+            content = b''.join(response.streaming_content).decode()
+        else:
+            content = response.content.decode()
+        if is_json:
+            content = json.loads(content) if content else None
+        return {'status': response.status_code, 'body': content}
@@ -0,0 +1,155 @@
+import hashlib
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import (DEFAULT_DB_ALIAS, DatabaseError, InterfaceError,
+                       OperationalError, connections)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'primary_pin'
+STICKY_SALT = 'backend.db_router'
+
+_state = threading.local()
+_down_until = {}
+
+
+def pin_to_primary(pinned=True):
+    """Направляет чтения текущего потока в основную базу.
+
+    Без запроса (фоновые задачи, команды) чтения идут в основную базу:
+    на реплики их отпускает только PrimaryStickinessMiddleware.
+    """
+    _state.pinned = pinned
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', True)
+
+
+def used_replicas():
+    """Реплики, из которых читал текущий поток с начала запроса"""
+    if not hasattr(_state, 'replicas'):
+        _state.replicas = set()
+    return _state.replicas
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def mark_down(alias):
+    """Исключает реплику на REPLICA_RETRY_SECONDS и закрывает соединение"""
+    _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+    try:
+        connections[alias].close()
+    except DatabaseError:
+        pass
+
+
+def replica_available(alias):
+    """Проверяет реплику и на время исключает недоступную"""
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        mark_down(alias)
+        return False
+    return True
+
+
+class PrimaryReplicaRouter:
+    """Роутер: чтения на реплики, запись и миграции в основную базу"""
+
+    def db_for_read(self, model, **hints):
+        if is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in replica_aliases()
+                    if replica_available(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        alias = random.choice(replicas)
+        used_replicas().add(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryStickinessMiddleware:
+    """Закрепляет чтения за основной базой после записи пользователя.
+
+    Метка хранится в подписанной cookie и, для клиентов с токеном,
+    в кэше под хэшем заголовка Authorization. Если реплика отвалилась
+    посреди чтения, она исключается, а вьюха вызывается повторно с
+    чтением из основной базы.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(replica_aliases())
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        is_write = request.method not in SAFE_METHODS
+        pin_to_primary(is_write or self.is_sticky(request))
+        used_replicas().clear()
+        try:
+            response = self.get_response(request)
+        finally:
+            pin_to_primary()
+        if is_write and response.status_code < 400:
+            self.make_sticky(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._replica_retry = (view_func, view_args, view_kwargs)
+
+    def process_exception(self, request, exception):
+        replicas = set(used_replicas())
+        if (not self.enabled or not replicas
+                or request.method not in SAFE_METHODS
+                or not isinstance(exception, (OperationalError,
+                                              InterfaceError))
+                or not hasattr(request, '_replica_retry')):
+            return None
+        for alias in replicas:
+            mark_down(alias)
+        pin_to_primary()
+        view_func, view_args, view_kwargs = request._replica_retry
+        del request._replica_retry
+        return view_func(request, *view_args, **view_kwargs)
+
+    @staticmethod
+    def cache_key(request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        digest = hashlib.sha256(authorization.encode()).hexdigest()
+        return f'primary-pin:{digest}'
+
+    def is_sticky(self, request):
+        if request.get_signed_cookie(
+                STICKY_COOKIE, default=None, salt=STICKY_SALT,
+                max_age=settings.REPLICA_STICKY_SECONDS):
+            return True
+        key = self.cache_key(request)
+        return key is not None and cache.get(key) is not None
+
+    def make_sticky(self, request, response):
+        seconds = settings.REPLICA_STICKY_SECONDS
+        response.set_signed_cookie(STICKY_COOKIE, '1', salt=STICKY_SALT,
+                                   max_age=seconds, httponly=True)
+        key = self.cache_key(request)
+        if key is not None:
+            cache.set(key, True, seconds)
@@ -0,0 +1,26 @@
+"""Проверки для оркестратора: процесс жив и готов принимать запросы."""
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.http import JsonResponse
+
+
+def live(request):
+    return JsonResponse({'status': 'ok'})
+
+
+def ready(request):
+    checks = {}
+    try:
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        checks['database'] = 'ok'
+    except DatabaseError as error:
+        checks['database'] = str(error)
+    try:
+        cache.set('health:ready', True, 5)
+        checks['cache'] = 'ok'
+    except Exception as error:
+        checks['cache'] = str(error)
+    healthy = all(value == 'ok' for value in checks.values())
+    return JsonResponse(checks, status=200 if healthy else 503)
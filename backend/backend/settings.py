@@ -21,6 +21,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
+    'jobs.apps.JobsConfig',
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
@@ -30,10 +31,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'backend.db_router.PrimaryStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,6 +77,44 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: хосты через запятую, для SQLite — пути к файлам.
+DB_REPLICAS = [replica for replica in os.getenv(
+    'DB_REPLICAS', default='').split(',') if replica]
+
+for number, location in enumerate(DB_REPLICAS, start=1):
+    replica = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if replica['ENGINE'].endswith('sqlite3'):
+        replica['NAME'] = location
+    else:
+        replica['HOST'] = location
+    DATABASES[f'replica_{number}'] = replica
+
+DATABASE_ROUTERS = ['backend.db_router.PrimaryReplicaRouter']
+
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', default=10))
+
+REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', default=30))
+
+# С CACHE_LOCATION (например, cache:11211) по умолчанию — общий memcached
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default=('django.core.cache.backends.memcached.PyMemcacheCache'
+                     if os.getenv('CACHE_LOCATION')
+                     else 'django.core.cache.backends.locmem.LocMemCache')
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+# Кэш в памяти процесса не виден другим воркерам gunicorn: данные,
+# которые сбрасываются счётчиком поколения, тогда не кэшируются
+CACHE_SHARED = os.getenv('CACHE_SHARED', default=str(
+    CACHES['default']['BACKEND'] not in (
+        'django.core.cache.backends.locmem.LocMemCache',
+        'django.core.cache.backends.dummy.DummyCache'))) == 'True'
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator', },
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', },
@@ -89,8 +131,21 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.CostThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user_cost': os.getenv('THROTTLE_USER_RATE', default='600/min')
+        or None,
+        'anon_cost': os.getenv('THROTTLE_ANON_RATE', default='120/min')
+        or None,
+    },
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
 }
 
+THROTTLE_COST_BYTES = 256 * 1024
+THROTTLE_LOCK_SECONDS = 1
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -99,7 +154,7 @@ DJOSER = {
                     'current_user': ('api.serializers.UsersSerializer')
                     },
     'PERMISSIONS': {'user': ('rest_framework.permissions.IsAuthenticated'),
-                    'user_delete': ('rest_framework.permissions.IsAdminUser'),
+                    'user_delete': ['rest_framework.permissions.IsAdminUser'],
                     },
 }
 
@@ -119,3 +174,72 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+DEFAULT_FILE_STORAGE = 'recipes.storage.ContentAddressedStorage'
+
+COMPRESSION_MIN_LENGTH = int(os.getenv('COMPRESSION_MIN_LENGTH', default=500))
+
+COMPRESSION_LEVELS = {
+    'gzip': int(os.getenv('GZIP_LEVEL', default=6)),
+    'br': int(os.getenv('BROTLI_LEVEL', default=5)),
+    'zstd': int(os.getenv('ZSTD_LEVEL', default=3)),
+}
+
+COMPRESSION_CACHE_PATHS = ('/api/tags/', '/api/ingredients/')
+
+COMPRESSION_CACHE_SECONDS = 60 * 60
+
+CHANGES_PAGE_SIZE = 1000
+
+CHANGES_SETTLE_SECONDS = 2
+
+CHANGES_RETENTION_DAYS = int(os.getenv('CHANGES_RETENTION_DAYS', default=30))
+
+DELETION_BATCH_SIZE = int(os.getenv('DELETION_BATCH_SIZE', default=1000))
+
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
+RECIPE_SIMILARITY_WARNING = os.getenv(
+    'RECIPE_SIMILARITY_WARNING', default='False') == 'True'
+
+FACETS_CACHE_SECONDS = 5 * 60
+
+FACETS_AUTHORS_LIMIT = 10
+
+API_CACHE_SECONDS = 5 * 60
+
+CACHE_LOCK_SECONDS = 10
+
+TRENDING_HALF_LIFE_HOURS = int(os.getenv('TRENDING_HALF_LIFE_HOURS',
+                                         default=72))
+
+TRENDING_REFRESH_MINUTES = 10
+
+SITE_URL = os.getenv('SITE_URL', default='http://localhost').rstrip('/')
+
+PRERENDER_ROOT = os.getenv('PRERENDER_ROOT',
+                           default=os.path.join(BASE_DIR, 'prerendered'))
+
+PRERENDER_ON_CHANGE = os.getenv('PRERENDER_ON_CHANGE',
+                                default='False') == 'True'
+
+PRERENDER_DELAY_SECONDS = 60
+
+PRERENDER_PROCESSES = int(os.getenv('PRERENDER_PROCESSES', default=2))
+
+SITEMAP_SHARD_SIZE = 50000
+
+BATCH_MAX_REQUESTS = 20
+
+JOB_HEARTBEAT_SECONDS = 30
+
+STREAM_JSON_LISTS = os.getenv('STREAM_JSON_LISTS', default='True') == 'True'
+
+STREAM_CHUNK_SIZE = 2000
+
+LIST_BODY_CACHE_MAX_BYTES = 4 * 2 ** 20
+
+RECIPE_IMAGE_MAX_BYTES = int(os.getenv('RECIPE_IMAGE_MAX_BYTES',
+                                       default=10 * 2 ** 20))
+
+RECIPE_IMAGE_MAX_SIDE = 6000
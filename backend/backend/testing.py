@@ -0,0 +1,38 @@
+"""Общие помощники тестов и проверок производительности"""
+import base64
+import io
+
+from django.test import TestCase
+from PIL import Image
+
+from users.models import User
+
+
+def pixel():
+    """Картинка 1×1 PNG в виде data URI, как её присылает фронтенд"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+def local_cache(location):
+    """Настройка CACHES с отдельным кэшем в памяти процесса"""
+    return {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': location}}
+
+
+class ChangelistQueriesTest(TestCase):
+    """Число запросов страницы списка в админке не зависит от числа строк"""
+
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@localhost', password='admin')
+        self.client.force_login(admin)
+
+    def assert_changelist_queries(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
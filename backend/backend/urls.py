@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from .health import live, ready
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
+    path('health/live/', live),
+    path('health/ready/', ready),
 ]
@@ -0,0 +1,88 @@
+"""Настройки gunicorn для продакшена.
+
+Число воркеров считается по доступным контейнеру ядрам (с учётом
+квоты cgroup), всё переопределяется переменными окружения GUNICORN_*.
+Приложение загружается в мастере до форка, чтобы код и данные Django
+были общими для воркеров через copy-on-write.
+"""
+import gc
+import os
+
+READY_FILE = os.getenv('GUNICORN_READY_FILE', '/tmp/gunicorn-ready')
+
+
+def cpu_count():
+    """Ядра, доступные процессу: квота cgroup или привязка к CPU"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quotas = (('/sys/fs/cgroup/cpu.max', None),
+              ('/sys/fs/cgroup/cpu/cpu.cfs_quota_us',
+               '/sys/fs/cgroup/cpu/cpu.cfs_period_us'))
+    for quota_path, period_path in quotas:
+        try:
+            with open(quota_path) as file:
+                values = file.read().split()
+            if period_path:
+                with open(period_path) as file:
+                    values.append(file.read().strip())
+        except OSError:
+            continue
+        quota, period = values[0], values[1]
+        if quota not in ('max', '-1'):
+            return max(1, min(cpus, -(-int(quota) // int(period))))
+    return cpus
+
+
+def env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = env_int('GUNICORN_WORKERS', cpu_count() * 2 + 1)
+threads = env_int('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1)
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Перезапуск воркеров от утечек памяти, не всех одновременно
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# Загрузка картинок в base64 бывает долгой
+timeout = env_int('GUNICORN_TIMEOUT', 60)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def when_ready(server):
+    """Мастер готов: догружаем всё, что воркеры импортируют лениво"""
+    if preload_app:
+        from django.urls import get_resolver
+        get_resolver().url_patterns  # импортирует urls, вьюхи, сериализаторы
+        # Объекты, созданные при загрузке, не трогаются сборщиком мусора
+        # и не копируются в каждый воркер при записи счётчиков
+        gc.collect()
+        gc.freeze()
+    with open(READY_FILE, 'w') as file:
+        file.write(str(os.getpid()))
+
+
+def post_fork(server, worker):
+    # Соединения, открытые мастером, нельзя делить между процессами
+    from django.db import connections
+    connections.close_all()
+
+
+def worker_abort(worker):
+    worker.log.warning('Воркер %s прерван по таймауту', worker.pid)
+
+
+def on_exit(server):
+    try:
+        os.remove(READY_FILE)
+    except OSError:
+        pass
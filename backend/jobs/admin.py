@@ -0,0 +1,14 @@
+from django.contrib import admin
+from django.contrib.admin import register
+
+from .models import Job
+
+
+@register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'priority', 'attempts',
+                    'duration', 'progress', 'created', 'finished',)
+    list_filter = ('status',)
+    search_fields = ('^task',)
+    show_full_result_count = False
+    save_on_top = True
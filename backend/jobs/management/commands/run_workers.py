@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from backend.db_router import pin_to_primary
+from jobs.queue import claim, execute, requeue_stale, stats
+
+
+class Command(BaseCommand):
+    help = '''Запуск воркеров очереди фоновых задач.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            default=os.cpu_count() or 1)
+        parser.add_argument('--mode', choices=('thread', 'process'),
+                            default='thread')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Через сколько секунд без отметки '
+                                 'воркера задача зависла')
+        parser.add_argument('--requeue-interval', type=float, default=60,
+                            help='Как часто, в секундах, возвращать '
+                                 'зависшие задачи в очередь')
+        parser.add_argument('--burst', action='store_true',
+                            help='Завершиться, когда очередь опустеет')
+        parser.add_argument('--stats', action='store_true',
+                            help='Показать статистику и выйти')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+        pin_to_primary()
+        concurrency = options['concurrency']
+        if options['mode'] == 'process':
+            executor = ProcessPoolExecutor(
+                concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup)
+        else:
+            executor = ThreadPoolExecutor(concurrency)
+        running = set()
+        requeued = None
+        with executor:
+            while True:
+                now = time.monotonic()
+                if (requeued is None
+                        or now - requeued >= options['requeue_interval']):
+                    requeue_stale(options['stale_after'])
+                    requeued = now
+                running = {future for future in running
+                           if not future.done()}
+                job_ids = claim(concurrency - len(running))
+                for job_id in job_ids:
+                    future = executor.submit(execute, job_id)
+                    future.add_done_callback(self.report_crash)
+                    running.add(future)
+                if job_ids:
+                    continue
+                if options['burst'] and not running:
+                    break
+                time.sleep(options['poll_interval'])
+
+    def report_crash(self, future):
+        """Ошибка, которую execute() не смог записать в задачу.
+
+        Сбои задачи и чтения или сохранения задачи execute() записывает
+        сам; сюда доходят ошибки при самой этой записи, например при
+        потере соединения с базой. Задача остаётся выполняемой, её
+        отметка воркера больше не обновляется, и через --stale-after
+        секунд она вернётся в очередь или, если попытки исчерпаны,
+        будет помечена ошибкой.
+        """
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.stderr.write(f'Сбой воркера: {error!r}')
+
+    def print_stats(self):
+        for row in stats():
+            self.stdout.write(
+                '{task}: всего {total}, выполнено {done}, ошибок {failed}, '
+                'в очереди {queued}, среднее {avg:.3f} с, '
+                'максимум {max:.3f} с'.format(
+                    avg=row['avg_duration'] or 0,
+                    max=row['max_duration'] or 0,
+                    **row))
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_job_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat',
+            field=models.DateTimeField(blank=True, help_text='Воркер обновляет её, пока выполняет задачу', null=True, verbose_name='Отметка воркера'),
+        ),
+    ]
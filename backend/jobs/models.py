@@ -0,0 +1,64 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Модель фоновой задачи"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    task = models.CharField(
+        'Задача',
+        max_length=200,
+        help_text='Путь к функции, например recipes.tasks.func',
+    )
+    args = models.JSONField('Аргументы', default=list, blank=True)
+    kwargs = models.JSONField('Именованные аргументы', default=dict,
+                              blank=True)
+    priority = models.SmallIntegerField(
+        'Приоритет',
+        default=0,
+        help_text='Задачи с большим приоритетом выполняются раньше',
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток',
+                                                    default=3)
+    run_at = models.DateTimeField('Выполнить после', default=timezone.now)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    started = models.DateTimeField('Начата', null=True, blank=True)
+    heartbeat = models.DateTimeField(
+        'Отметка воркера',
+        null=True,
+        blank=True,
+        help_text='Воркер обновляет её, пока выполняет задачу',
+    )
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+    duration = models.FloatField('Длительность, с', null=True, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+    progress = models.JSONField('Прогресс', default=dict, blank=True)
+
+    class Meta:
+        ordering = ('-priority', 'run_at', 'id')
+        indexes = (
+            models.Index(fields=['status', '-priority', 'run_at'],
+                         name='job_queue_idx'),
+        )
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+
+    def __str__(self):
+        return f'{self.task} #{self.id}'
@@ -0,0 +1,161 @@
+"""Очередь фоновых задач в базе данных, без внешнего брокера."""
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from backend.db_router import pin_to_primary
+
+from .models import Job
+
+_current = threading.local()
+
+
+def enqueue(task, *args, priority=0, max_attempts=3, run_at=None,
+            **kwargs):
+    """Ставит в очередь функцию или путь к ней с аргументами"""
+    if callable(task):
+        task = f'{task.__module__}.{task.__qualname__}'
+    return Job.objects.create(
+        task=task,
+        args=list(args),
+        kwargs=kwargs,
+        priority=priority,
+        max_attempts=max_attempts,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def on_commit_once(func):
+    """transaction.on_commit, если func ещё не ждёт фиксации транзакции"""
+    pending = transaction.get_connection().run_on_commit
+    if not any(entry[1] is func for entry in pending):
+        transaction.on_commit(func)
+
+
+def claim(limit=1):
+    """Забирает до limit готовых задач и помечает их выполняемыми.
+
+    Где база умеет SELECT ... FOR UPDATE SKIP LOCKED, воркеры не ждут
+    друг друга; иначе (SQLite) задача захватывается условным UPDATE.
+    """
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready.select_for_update(
+                skip_locked=True).values_list('id', flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(
+                status=Job.RUNNING, started=now, heartbeat=now,
+                attempts=F('attempts') + 1)
+    else:
+        ids = [
+            job_id for job_id in ready.values_list('id', flat=True)[:limit]
+            if Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+                status=Job.RUNNING, started=now, heartbeat=now,
+                attempts=F('attempts') + 1)
+        ]
+    return ids
+
+
+def execute(job_id):
+    """Выполняет захваченную задачу и записывает результат"""
+    # Задачу только что захватили в основной базе, реплика может отставать
+    pin_to_primary()
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job_id, stop),
+                            daemon=True)
+    beat.start()
+    try:
+        return _execute(job_id)
+    except Exception:
+        # Сбой вне самой задачи (чтение или сохранение задачи): она не
+        # должна навсегда остаться выполняемой
+        Job.objects.filter(id=job_id, status=Job.RUNNING).update(
+            status=Job.FAILED, error=traceback.format_exc(),
+            finished=timezone.now())
+        return Job.FAILED
+    finally:
+        stop.set()
+        beat.join()
+        _current.job_id = None
+        connections.close_all()
+
+
+def _heartbeat(job_id, stop):
+    """Пока задача выполняется, обновляет её отметку воркера"""
+    try:
+        while not stop.wait(settings.JOB_HEARTBEAT_SECONDS):
+            Job.objects.filter(id=job_id, status=Job.RUNNING).update(
+                heartbeat=timezone.now())
+    finally:
+        connection.close()
+
+
+def _execute(job_id):
+    job = Job.objects.get(id=job_id)
+    _current.job_id = job_id
+    start = time.perf_counter()
+    try:
+        import_string(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=2 ** job.attempts)
+        else:
+            job.status = Job.FAILED
+    else:
+        job.status = Job.DONE
+        job.error = ''
+    job.duration = time.perf_counter() - start
+    job.finished = timezone.now()
+    job.save(update_fields=('status', 'error', 'run_at',
+                            'duration', 'finished'))
+    return job.status
+
+
+def report_progress(**progress):
+    """Сохраняет прогресс задачи, которая сейчас выполняется в потоке"""
+    job_id = getattr(_current, 'job_id', None)
+    if job_id is not None:
+        Job.objects.filter(id=job_id).update(progress=progress)
+
+
+def requeue_stale(seconds):
+    """Возвращает в очередь задачи, зависшие у упавших воркеров.
+
+    Задача зависла, если её отметка воркера не обновлялась seconds
+    секунд: живой воркер обновляет её каждые JOB_HEARTBEAT_SECONDS, и
+    долгая задача не выполнится дважды. Задачи, исчерпавшие попытки
+    (например, каждый раз роняющие воркер), помечаются ошибкой.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=seconds)
+    stale = Job.objects.filter(
+        Q(heartbeat__lt=cutoff)
+        | Q(heartbeat__isnull=True, started__lt=cutoff),
+        status=Job.RUNNING)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished=now,
+        error=f'Воркер не отвечал {seconds} с, попытки исчерпаны')
+    return stale.update(status=Job.QUEUED)
+
+
+def stats():
+    """Статистика выполнения по задачам"""
+    return Job.objects.values('task').annotate(
+        total=Count('id'),
+        done=Count('id', filter=Q(status=Job.DONE)),
+        failed=Count('id', filter=Q(status=Job.FAILED)),
+        queued=Count('id', filter=Q(status=Job.QUEUED)),
+        avg_duration=Avg('duration'),
+        max_duration=Max('duration'),
+    ).order_by('task')
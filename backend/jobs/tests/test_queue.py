@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import (claim, enqueue, execute, on_commit_once,
+                        requeue_stale)
+
+
+def succeed():
+    pass
+
+
+def work(seconds):
+    time.sleep(seconds)
+
+
+class ExecuteTest(TransactionTestCase):
+
+    def test_task_runs(self):
+        job = enqueue(succeed)
+        self.assertEqual(claim(), [job.id])
+        self.assertEqual(execute(job.id), Job.DONE)
+
+    def test_failure_outside_task_marks_job_failed(self):
+        job = enqueue(succeed)
+        claim()
+        with mock.patch.object(Job, 'save',
+                               side_effect=DatabaseError('connection lost')):
+            self.assertEqual(execute(job.id), Job.FAILED)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('connection lost', job.error)
+
+    @override_settings(JOB_HEARTBEAT_SECONDS=0.05)
+    def test_heartbeat_while_running(self):
+        job = enqueue(work, 0.3)
+        claim()
+        claimed = Job.objects.get(id=job.id).heartbeat
+        self.assertEqual(execute(job.id), Job.DONE)
+        self.assertGreater(Job.objects.get(id=job.id).heartbeat, claimed)
+
+
+class RequeueStaleTest(TransactionTestCase):
+
+    def running(self, heartbeat_age, attempts=1):
+        now = timezone.now()
+        return Job.objects.create(
+            task='jobs.tests.test_queue.succeed', status=Job.RUNNING,
+            attempts=attempts, max_attempts=3,
+            started=now - timedelta(hours=2),
+            heartbeat=now - timedelta(seconds=heartbeat_age))
+
+    def test_requeues_only_silent_jobs(self):
+        alive = self.running(heartbeat_age=10)
+        silent = self.running(heartbeat_age=600)
+        self.assertEqual(requeue_stale(300), 1)
+        self.assertEqual(Job.objects.get(id=alive.id).status, Job.RUNNING)
+        self.assertEqual(Job.objects.get(id=silent.id).status, Job.QUEUED)
+
+    def test_exhausted_attempts_fail(self):
+        job = self.running(heartbeat_age=600, attempts=3)
+        self.assertEqual(requeue_stale(300), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('попытки исчерпаны', job.error)
+
+
+class OnCommitOnceTest(TestCase):
+
+    def test_one_callback_per_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            on_commit_once(succeed)
+            on_commit_once(succeed)
+            on_commit_once(work)
+        self.assertEqual(callbacks, [succeed, work])
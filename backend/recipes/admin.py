@@ -1,47 +1,132 @@
 from django.contrib import admin
 from django.contrib.admin import register
 from django.contrib.auth.models import Group
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.html import format_html_join
 
+from .deletion import soft_delete_recipes
 from .models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                     ShoppingCart, Tag)
+                     RecipeSignature, ShoppingCart, Tag)
+from .similarity import similar_by_signature, unpack
 
 admin.site.unregister(Group)
 
 
 class IngredientRecipeInLine(admin.TabularInline):
     model = Recipe.ingredients.through
+    autocomplete_fields = ('ingredients',)
     extra = 3
 
 
-@register(Tag, IngredientAmount)
-class OtherAdmin(admin.ModelAdmin):
-    pass
+@register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'color',)
+    search_fields = ('name', 'slug',)
+
+
+@register(IngredientAmount)
+class IngredientAmountAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'ingredients', 'amount',)
+    list_select_related = ('recipe', 'ingredients',)
+    raw_id_fields = ('recipe', 'ingredients',)
+    show_full_result_count = False
 
 
 @register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit',)
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
+    search_fields = ('^name',)
+    show_full_result_count = False
     save_on_top = True
 
 
 @register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author',)
-    list_filter = ('name', 'author__username', 'tags__name')
+    list_display = ('name', 'author', 'favorites_count',)
+    list_filter = ('tags', 'is_deleted')
+    list_select_related = ('author',)
+    search_fields = ('name', '^author__username',)
+    autocomplete_fields = ('author', 'tags',)
+    show_full_result_count = False
     save_on_top = True
     inlines = (IngredientRecipeInLine, )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            favorites_count=Count('favorite'))
+
+    @admin.display(description='В избранном',
+                   ordering='favorites_count')
+    def favorites_count(self, recipe):
+        return recipe.favorites_count
+
+    def get_deleted_objects(self, objs, request):
+        if isinstance(objs, list):
+            return super().get_deleted_objects(objs, request)
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_queryset(self, request, queryset):
+        soft_delete_recipes(queryset.order_by().values_list('id', flat=True))
+        self.message_user(request, 'Рецепты скрыты и удаляются в фоновой '
+                                   'задаче')
+
 
 @register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe',)
-    list_filter = ('user',)
+    list_select_related = ('user', 'recipe',)
+    search_fields = ('^user__username', 'recipe__name',)
+    autocomplete_fields = ('user', 'recipe',)
+    show_full_result_count = False
     save_on_top = True
 
 
 @register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe',)
-    list_filter = ('user',)
+    list_select_related = ('user', 'recipe',)
+    search_fields = ('^user__username', 'recipe__name',)
+    autocomplete_fields = ('user', 'recipe',)
+    show_full_result_count = False
     save_on_top = True
+
+
+@register(RecipeSignature)
+class RecipeSignatureAdmin(admin.ModelAdmin):
+    """Отчёт о вероятных дубликатах рецептов"""
+    list_display = ('recipe', 'similar',)
+    list_select_related = ('recipe',)
+    search_fields = ('recipe__name',)
+    show_full_result_count = False
+    list_per_page = 20
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_changelist_instance(self, request):
+        # Похожие рецепты для всей страницы считаются двумя запросами
+        changelist = super().get_changelist_instance(request)
+        signatures = list(changelist.result_list)
+        similar = similar_by_signature({
+            signature.recipe_id: unpack(signature.minhash)
+            for signature in signatures})
+        for signature in signatures:
+            signature.similar_recipes = similar[signature.recipe_id]
+        return changelist
+
+    @admin.display(description='Похожие рецепты')
+    def similar(self, signature):
+        pairs = getattr(signature, 'similar_recipes', None)
+        if pairs is None:
+            pairs = similar_by_signature({
+                signature.recipe_id: unpack(signature.minhash)
+            })[signature.recipe_id]
+        return format_html_join(
+            ', ', '<a href="{}">#{}</a> ({})',
+            ((reverse('admin:recipes_recipe_change', args=(recipe_id,)),
+              recipe_id, f'{score:.0%}') for recipe_id, score in pairs))
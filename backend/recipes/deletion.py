@@ -0,0 +1,132 @@
+"""Удаление пользователей и рецептов пачками прямыми DELETE.
+
+Django при каскадном удалении сначала загружает все связанные строки
+в память; здесь строки удаляются SQL-запросами по пачкам id, а журнал
+изменений и счётчики картинок обновляются вручную, а кэши API
+сбрасываются сигналом recipes_changed_in_bulk.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.dispatch import Signal
+from rest_framework.authtoken.models import Token
+
+from jobs.queue import enqueue, report_progress
+from users.models import Follow, User
+from .models import (Change, Favorite, ImageBlob, IngredientAmount, Recipe,
+                     RecipeBucket, RecipeSignature, ShoppingCart, Trending)
+from .prerender import schedule_prerender
+from .signals import recipes_changed_in_bulk
+
+# Пользователь скрыт, но его строки ещё не удалены: сигналы моделей
+# не срабатывают, кэши сбрасываются по этому сигналу
+user_soft_deleted = Signal()
+
+
+def raw_delete(model, field, values):
+    """DELETE FROM <таблица> WHERE <поле> IN (...) без загрузки строк"""
+    if not values:
+        return
+    quote = connection.ops.quote_name
+    column = model._meta.get_field(field).column
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(column)} IN ({placeholders})', list(values))
+
+
+def delete_recipes(recipe_ids):
+    """Удаляет одну пачку рецептов со всеми зависимыми строками"""
+    recipe_ids = list(recipe_ids)
+    with transaction.atomic():
+        user_ids = set()
+        for model in (Favorite, ShoppingCart):
+            collection = (Change.FAVORITES if model is Favorite
+                          else Change.SHOPPING_CART)
+            rows = list(model.objects.filter(
+                recipe_id__in=recipe_ids).values_list(
+                    'user_id', 'recipe_id'))
+            Change.objects.bulk_create(
+                Change(collection=collection, action=Change.DELETED,
+                       object_id=recipe_id, user_id=user_id)
+                for user_id, recipe_id in rows)
+            user_ids.update(user_id for user_id, _ in rows)
+            raw_delete(model, 'recipe', recipe_ids)
+        for model in (IngredientAmount, Recipe.tags.through,
+                      RecipeBucket, RecipeSignature, Trending):
+            raw_delete(model, 'recipe', recipe_ids)
+        images = Counter(Recipe.objects.filter(
+            id__in=recipe_ids).values_list('image', flat=True))
+        raw_delete(Recipe, 'id', recipe_ids)
+        for name, count in images.items():
+            ImageBlob.change_refs(name, -count)
+        Change.log(Change.RECIPES, Change.DELETED, recipe_ids)
+        schedule_prerender()
+        transaction.on_commit(lambda: recipes_changed_in_bulk.send(
+            sender=Recipe, recipe_ids=recipe_ids, user_ids=user_ids))
+
+
+def delete_in_batches(queryset, batch_size, callback=None):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        if callback is None:
+            raw_delete(queryset.model, 'id', ids)
+        else:
+            callback(ids)
+        deleted += len(ids)
+        report_progress(model=queryset.model._meta.model_name,
+                        deleted=deleted)
+
+
+def purge_user(user_id, batch_size=None):
+    """Фоновая задача: удаляет пользователя и всё, что с ним связано"""
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    delete_in_batches(Recipe.objects.filter(author_id=user_id), batch_size,
+                      delete_recipes)
+    Change.objects.bulk_create(
+        Change(collection=Change.SUBSCRIPTIONS, action=Change.DELETED,
+               object_id=user_id, user_id=follower_id)
+        for follower_id in Follow.objects.filter(
+            author_id=user_id).values_list('user_id', flat=True))
+    for queryset in (Favorite.objects.filter(user_id=user_id),
+                     ShoppingCart.objects.filter(user_id=user_id),
+                     Follow.objects.filter(user_id=user_id),
+                     Follow.objects.filter(author_id=user_id),
+                     Change.objects.filter(user_id=user_id)):
+        delete_in_batches(queryset, batch_size)
+    User.objects.filter(id=user_id).delete()
+
+
+def purge_recipes(recipe_ids, batch_size=None):
+    """Фоновая задача: удаляет рецепты пачками"""
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    delete_in_batches(Recipe.objects.filter(id__in=recipe_ids), batch_size,
+                      delete_recipes)
+
+
+def soft_delete_recipes(recipe_ids):
+    """Сразу скрывает рецепты, удаление — в фоне"""
+    recipe_ids = list(recipe_ids)
+    Recipe.objects.filter(id__in=recipe_ids).update(is_deleted=True)
+    schedule_prerender()
+    user_ids = set()
+    for model in (Favorite, ShoppingCart):
+        user_ids.update(model.objects.filter(
+            recipe_id__in=recipe_ids).values_list('user_id', flat=True))
+    transaction.on_commit(lambda: recipes_changed_in_bulk.send(
+        sender=Recipe, recipe_ids=recipe_ids, user_ids=user_ids))
+    return enqueue(purge_recipes, recipe_ids)
+
+
+def soft_delete_user(user):
+    """Сразу скрывает пользователя и его рецепты, удаление — в фоне"""
+    User.objects.filter(id=user.id).update(is_deleted=True, is_active=False)
+    Token.objects.filter(user=user).delete()
+    schedule_prerender()
+    user_soft_deleted.send(sender=User, user_id=user.id)
+    return enqueue(purge_user, user.id)
@@ -0,0 +1,75 @@
+import random
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import band_buckets, minhash, similarity
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second)
+
+
+class Command(BaseCommand):
+    help = '''Замер поиска похожих рецептов на синтетических данных:
+    MinHash/LSH против полного перебора.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--threshold', type=float, default=0.5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        count, threshold = options['count'], options['threshold']
+        recipes = []
+        for _ in range(count):
+            if recipes and generator.random() < 0.1:
+                items = set(generator.choice(recipes))
+                items.discard(generator.choice(sorted(items)))
+                items.add(f'i:{generator.randrange(2000)}')
+            else:
+                items = {f'i:{generator.randrange(2000)}'
+                         for _ in range(generator.randint(4, 12))}
+            recipes.append(frozenset(items))
+
+        start = time.perf_counter()
+        signatures = [minhash(items) for items in recipes]
+        index = defaultdict(list)
+        for recipe_id, signature in enumerate(signatures):
+            for band, bucket in enumerate(band_buckets(signature)):
+                index[band, bucket].append(recipe_id)
+        self.stdout.write(
+            f'Сигнатуры и индекс для {count} рецептов: '
+            f'{time.perf_counter() - start:.1f} с')
+
+        queries = generator.sample(range(count), options['queries'])
+        lsh_time = brute_time = 0
+        found = expected = 0
+        for query in queries:
+            start = time.perf_counter()
+            candidates = {
+                recipe_id
+                for band, bucket in enumerate(band_buckets(
+                    signatures[query]))
+                for recipe_id in index[band, bucket]} - {query}
+            lsh = {recipe_id for recipe_id in candidates
+                   if similarity(signatures[query],
+                                 signatures[recipe_id]) >= threshold}
+            lsh_time += time.perf_counter() - start
+            start = time.perf_counter()
+            exact = {recipe_id for recipe_id, items in enumerate(recipes)
+                     if recipe_id != query
+                     and jaccard(recipes[query], items) >= threshold}
+            brute_time += time.perf_counter() - start
+            found += len(lsh & exact)
+            expected += len(exact)
+        queries = len(queries)
+        self.stdout.write(
+            f'LSH: {lsh_time / queries * 1000:.2f} мс на запрос, '
+            f'перебор: {brute_time / queries * 1000:.2f} мс на запрос')
+        self.stdout.write(
+            f'Полнота: {found / max(expected, 1):.1%} '
+            f'({found} из {expected} пар)')
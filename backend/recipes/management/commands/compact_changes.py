@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import Change
+
+
+class Command(BaseCommand):
+    help = '''Удаление старых записей журнала изменений.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=settings.CHANGES_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        # Последняя запись остаётся всегда: по самой старой сохранённой
+        # записи API отличает устаревший токен от актуального.
+        latest = Change.objects.order_by('-id').values_list(
+            'id', flat=True).first()
+        if latest is None:
+            return
+        deleted, _ = Change.objects.filter(
+            id__lt=latest,
+            created__lt=timezone.now() - timedelta(days=options['days']),
+        ).delete()
+        self.stdout.write(f'Удалено записей: {deleted}')
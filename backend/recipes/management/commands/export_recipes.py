@@ -0,0 +1,25 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.ndjson import export_recipes
+
+
+class Command(BaseCommand):
+    help = '''Выгрузка рецептов в файл NDJSON.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-',
+                            help='Файл для выгрузки, по умолчанию stdout')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--blobs-dir',
+                            help='Каталог для файлов картинок по хэшам')
+
+    def handle(self, *args, **options):
+        lines = export_recipes(chunk_size=options['chunk_size'],
+                               blobs_dir=options['blobs_dir'])
+        if options['output'] == '-':
+            sys.stdout.writelines(lines)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            file.writelines(lines)
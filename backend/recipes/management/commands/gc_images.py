@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from recipes.models import ImageBlob, Recipe
+
+
+class Command(BaseCommand):
+    help = '''Удаление картинок, на которые не ссылаются рецепты.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=24,
+                            help='Не трогать файлы, изменённые недавно')
+        parser.add_argument('--recount', action='store_true',
+                            help='Пересчитать ссылки по таблице рецептов')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def recount(self):
+        counts = dict(Recipe.objects.exclude(image='').values_list(
+            'image').annotate(Count('id')).order_by())
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=name) for name in counts],
+            ignore_conflicts=True)
+        for blob in ImageBlob.objects.iterator():
+            refs = counts.get(blob.name, 0)
+            if blob.refs != refs:
+                ImageBlob.objects.filter(id=blob.id).update(
+                    refs=refs, updated=timezone.now())
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.recount()
+        orphans = ImageBlob.objects.filter(
+            refs__lte=0,
+            updated__lt=timezone.now() - timedelta(
+                hours=options['grace_hours']))
+        removed = 0
+        for blob in orphans.iterator():
+            if options['dry_run']:
+                removed += 1
+                continue
+            # Условие проверяется ещё раз при удалении: если на файл
+            # успели снова сослаться, запись и файл остаются
+            deleted, _ = orphans.filter(id=blob.id).delete()
+            if deleted:
+                default_storage.delete(blob.name)
+                removed += 1
+        self.stdout.write(f'Удалено файлов: {removed}')
@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.ndjson import import_recipes
+
+
+class Command(BaseCommand):
+    help = '''Загрузка рецептов из файла NDJSON.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл NDJSON или - для stdin')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--blobs-dir',
+                            help='Каталог с файлами картинок по хэшам')
+
+    def handle(self, *args, **options):
+        try:
+            if options['input'] == '-':
+                imported = import_recipes(
+                    sys.stdin, options['batch_size'], options['blobs_dir'])
+            else:
+                with open(options['input'], encoding='utf-8') as file:
+                    imported = import_recipes(
+                        file, options['batch_size'], options['blobs_dir'])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(f'Загружено рецептов: {imported}')
@@ -0,0 +1,19 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from recipes.prerender import prerender_recipes
+
+
+class Command(BaseCommand):
+    help = '''Статические страницы рецептов и sitemap для роботов.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int,
+                            default=os.cpu_count() or 1)
+        parser.add_argument('--force', action='store_true',
+                            help='Перерисовать все рецепты')
+
+    def handle(self, *args, **options):
+        rendered = prerender_recipes(options['processes'], options['force'])
+        self.stdout.write(f'Перерисовано рецептов: {rendered}')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Trending
+from recipes.trending import refresh_trending, schedule_trending
+
+
+class Command(BaseCommand):
+    help = '''Обновление популярности рецептов по новым событиям.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Пересчитать по всем событиям')
+        parser.add_argument('--schedule', action='store_true',
+                            help='Обновлять периодически через очередь '
+                                 'фоновых задач')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            if schedule_trending() is None:
+                self.stdout.write('Обновление уже в очереди')
+            else:
+                self.stdout.write('Периодическое обновление поставлено')
+            return
+        if options['rebuild']:
+            Trending.objects.all().delete()
+        self.stdout.write(f'Обновлено рецептов: {refresh_trending()}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.similarity import update_signature
+
+
+class Command(BaseCommand):
+    help = '''Пересчёт сигнатур для поиска похожих рецептов.'''
+
+    def handle(self, *args, **options):
+        ids = Recipe.objects.values_list('id', flat=True).order_by('id')
+        for count, recipe_id in enumerate(ids.iterator(), 1):
+            update_signature(recipe_id)
+            if count % 1000 == 0:
+                self.stdout.write(f'Обработано рецептов: {count}')
+        self.stdout.write('Сигнатуры обновлены')
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.15 on 2026-10-19 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import datetime
+
+# Прежние добавления получают дату эпохи популярности (recipes.trending.EPOCH):
+# их настоящее время неизвестно, и с датой миграции они все разом попали бы
+# в популярное как свежие.
+BACKFILL_CREATED = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_signature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=BACKFILL_CREATED, verbose_name='Добавлен'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=BACKFILL_CREATED, verbose_name='Добавлен'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='Trending',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('score', models.FloatField(db_index=True, verbose_name='Популярность')),
+                ('updated', models.DateTimeField(verbose_name='Учтены события до')),
+            ],
+            options={
+                'verbose_name': 'Популярность рецепта',
+                'verbose_name_plural': 'Популярные рецепты',
+            },
+        ),
+    ]
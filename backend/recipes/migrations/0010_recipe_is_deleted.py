@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='is_deleted',
+            field=models.BooleanField(default=False, help_text='Ожидает фонового удаления', verbose_name='Удалён'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 from users.models import User
 
@@ -90,9 +91,29 @@ class Recipe(models.Model):
             MinValueValidator(
                 1, message='Время должно быть больше 1 минуты'),),
     )
+    created = models.DateTimeField(
+        'Создан',
+        auto_now_add=True,
+    )
+    updated = models.DateTimeField(
+        'Изменён',
+        auto_now=True,
+        db_index=True,
+    )
+    is_deleted = models.BooleanField(
+        'Удалён',
+        default=False,
+        help_text='Ожидает фонового удаления',
+    )
 
     class Meta:
         ordering = ('-id',)
+        indexes = (
+            models.Index(fields=['cooking_time', 'id'],
+                         name='recipe_cooking_time_idx'),
+            models.Index(fields=['name', 'id'],
+                         name='recipe_name_idx'),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -153,6 +174,11 @@ class Favorite(models.Model):
         verbose_name='Рецепт',
         related_name='favorite',
     )
+    created = models.DateTimeField(
+        'Добавлен',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         constraints = (
@@ -178,6 +204,11 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
         related_name='shopping_cart',
     )
+    created = models.DateTimeField(
+        'Добавлен',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         ordering = ('-id',)
@@ -188,3 +219,167 @@ class ShoppingCart(models.Model):
         )
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзины'
+
+
+class ImageBlob(models.Model):
+    """Файл картинки в хранилище и число рецептов, ссылающихся на него"""
+    name = models.CharField(
+        'Файл',
+        max_length=255,
+        unique=True,
+    )
+    refs = models.IntegerField(
+        'Ссылок',
+        default=0,
+    )
+    updated = models.DateTimeField(
+        'Изменён',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name}: {self.refs}'
+
+    @classmethod
+    def change_refs(cls, name, delta):
+        if not name:
+            return
+        cls.objects.get_or_create(name=name)
+        # update() не трогает auto_now, а по updated отсчитывается
+        # отсрочка удаления в gc_images
+        cls.objects.filter(name=name).update(
+            refs=models.F('refs') + delta, updated=timezone.now())
+
+
+class Change(models.Model):
+    """Журнал изменений для синхронизации клиентов.
+
+    Номер записи служит монотонным токеном синхронизации. Записи без
+    пользователя видны всем, остальные — только своему пользователю.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (CREATED, 'Создан'),
+        (UPDATED, 'Изменён'),
+        (DELETED, 'Удалён'),
+    )
+    RECIPES = 'recipes'
+    FAVORITES = 'favorites'
+    SHOPPING_CART = 'shopping_cart'
+    SUBSCRIPTIONS = 'subscriptions'
+    COLLECTIONS = (
+        (RECIPES, 'Рецепты'),
+        (FAVORITES, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+        (SUBSCRIPTIONS, 'Подписки'),
+    )
+
+    collection = models.CharField(
+        'Коллекция',
+        max_length=20,
+        choices=COLLECTIONS,
+    )
+    object_id = models.BigIntegerField('Объект')
+    action = models.CharField(
+        'Действие',
+        max_length=10,
+        choices=ACTIONS,
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name='Пользователь',
+        related_name='changes',
+    )
+    created = models.DateTimeField(
+        'Время',
+        auto_now_add=True,
+        db_index=True,
+    )
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Изменения'
+
+    def __str__(self):
+        return f'{self.collection} {self.object_id} {self.action}'
+
+    @classmethod
+    def log(cls, collection, action, object_ids, user_id=None):
+        cls.objects.bulk_create(
+            cls(collection=collection, action=action,
+                object_id=object_id, user_id=user_id)
+            for object_id in object_ids)
+
+
+class RecipeSignature(models.Model):
+    """MinHash-сигнатура рецепта для поиска дубликатов"""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='signature',
+    )
+    minhash = models.BinaryField('Сигнатура')
+    source_updated = models.DateTimeField('Версия рецепта')
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id}'
+
+
+class RecipeBucket(models.Model):
+    """Полоса MinHash-сигнатуры рецепта в LSH-индексе"""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='buckets',
+    )
+    band = models.PositiveSmallIntegerField('Полоса')
+    bucket = models.BigIntegerField('Корзина')
+
+    class Meta:
+        indexes = (
+            models.Index(fields=['band', 'bucket'],
+                         name='recipe_bucket_idx'),
+        )
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+
+
+class Trending(models.Model):
+    """Популярность рецепта с затуханием по времени.
+
+    score — двоичный логарифм суммы вкладов, приведённых к общей эпохе,
+    порядок по нему совпадает с порядком по текущей популярности.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='trending',
+    )
+    score = models.FloatField('Популярность', db_index=True)
+    updated = models.DateTimeField('Учтены события до')
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярные рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.score}'
@@ -0,0 +1,198 @@
+"""Перенос рецептов в формате NDJSON: одна строка — один рецепт.
+
+Картинки не встраиваются в файл, а передаются ссылкой с SHA-256
+содержимого; сами файлы можно выгрузить в каталог, где они лежат
+под именами своих хэшей.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+from collections import Counter
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from jobs.queue import enqueue
+from users.models import User
+
+from .models import (Change, ImageBlob, Ingredient, IngredientAmount, Recipe,
+                     Tag)
+from .prerender import schedule_prerender
+from .signals import recipes_changed_in_bulk
+from .similarity import update_signatures
+
+HASH_CHUNK_SIZE = 64 * 1024
+# Имя в ContentAddressedStorage: recipes/ab/<sha256>.png
+CONTENT_NAME = re.compile(r'(?:^|/)([0-9a-f]{64})(?:\.\w+)?$')
+
+
+def image_sha256(image):
+    """Хэш содержимого картинки: из имени файла, если оно адресовано
+    содержимым, иначе считается по частям"""
+    match = CONTENT_NAME.search(image.name)
+    if match:
+        return match.group(1)
+    digest = hashlib.sha256()
+    with image.open('rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _export_image(image, blobs_dir):
+    if not image or not default_storage.exists(image.name):
+        return None
+    sha256 = image_sha256(image)
+    if blobs_dir:
+        blob_path = os.path.join(blobs_dir, sha256)
+        if not os.path.exists(blob_path):
+            with image.open('rb') as source:
+                with open(blob_path + '.tmp', 'wb') as target:
+                    shutil.copyfileobj(source, target, HASH_CHUNK_SIZE)
+            os.replace(blob_path + '.tmp', blob_path)
+    return {'sha256': sha256, 'name': image.name}
+
+
+def _export_chunk(recipes, blobs_dir):
+    ids = [recipe.id for recipe in recipes]
+    ingredients = {recipe_id: [] for recipe_id in ids}
+    for recipe_id, name, unit, amount in IngredientAmount.objects.filter(
+            recipe_id__in=ids).order_by('id').values_list(
+                'recipe_id', 'ingredients__name',
+                'ingredients__measurement_unit', 'amount'):
+        ingredients[recipe_id].append([name, unit, amount])
+    tags = {recipe_id: [] for recipe_id in ids}
+    for recipe_id, slug in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids).order_by('id').values_list(
+                'recipe_id', 'tag__slug'):
+        tags[recipe_id].append(slug)
+    for recipe in recipes:
+        record = {
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'author': recipe.author.username,
+            'tags': tags[recipe.id],
+            'ingredients': ingredients[recipe.id],
+            'image': _export_image(recipe.image, blobs_dir),
+        }
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def export_recipes(queryset=None, chunk_size=500, blobs_dir=None):
+    """Генератор строк NDJSON; в памяти не больше chunk_size рецептов"""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    recipes = queryset.select_related('author').order_by('id').iterator(
+        chunk_size=chunk_size)
+    chunk = []
+    for recipe in recipes:
+        chunk.append(recipe)
+        if len(chunk) == chunk_size:
+            yield from _export_chunk(chunk, blobs_dir)
+            chunk = []
+    if chunk:
+        yield from _export_chunk(chunk, blobs_dir)
+
+
+def _import_image(image, blobs_dir):
+    if not image:
+        return ''
+    if default_storage.exists(image['name']):
+        return image['name']
+    blob_path = os.path.join(blobs_dir or '', image['sha256'])
+    if not blobs_dir or not os.path.exists(blob_path):
+        raise ValueError(f'Нет файла картинки {image["sha256"]}')
+    with open(blob_path, 'rb') as blob:
+        return default_storage.save(image['name'], File(blob))
+
+
+def _ingredient_ids(records):
+    pairs = {(name, unit) for record in records
+             for name, unit, _ in record['ingredients']}
+    names = {name for name, _ in pairs}
+    found = {
+        (name, unit): pk for pk, name, unit in Ingredient.objects.filter(
+            name__in=names).values_list('id', 'name', 'measurement_unit')}
+    missing = pairs - found.keys()
+    if missing:
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in missing], ignore_conflicts=True)
+        return _ingredient_ids(records)
+    return found
+
+
+def _import_batch(records, tags, blobs_dir):
+    usernames = {record['author'] for record in records}
+    authors = dict(User.objects.filter(
+        username__in=usernames).values_list('username', 'id'))
+    unknown = usernames - authors.keys()
+    if unknown:
+        raise ValueError(f'Нет пользователей: {", ".join(sorted(unknown))}')
+    unknown = {slug for record in records
+               for slug in record['tags']} - tags.keys()
+    if unknown:
+        raise ValueError(f'Нет тэгов: {", ".join(sorted(unknown))}')
+    ingredients = _ingredient_ids(records)
+    recipes = [
+        Recipe(author_id=authors[record['author']],
+               name=record['name'],
+               text=record['text'],
+               cooking_time=record['cooking_time'],
+               image=_import_image(record['image'], blobs_dir))
+        for record in records
+    ]
+    with transaction.atomic():
+        bulk = connection.features.can_return_rows_from_bulk_insert
+        if bulk:
+            Recipe.objects.bulk_create(recipes)
+            images = Counter(recipe.image.name for recipe in recipes)
+            for name, count in images.items():
+                ImageBlob.change_refs(name, count)
+        else:
+            for recipe in recipes:
+                recipe.save()
+        amounts = {}
+        for recipe, record in zip(recipes, records):
+            for name, unit, amount in record['ingredients']:
+                key = (recipe.id, ingredients[(name, unit)])
+                amounts[key] = amounts.get(key, 0) + amount
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe_id=recipe_id,
+                             ingredients_id=ingredient_id,
+                             amount=amount)
+            for (recipe_id, ingredient_id), amount in amounts.items())
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[slug])
+            for recipe, record in zip(recipes, records)
+            for slug in set(record['tags']))
+        recipe_ids = [recipe.id for recipe in recipes]
+        if bulk:
+            # То, что при save() делают сигналы моделей
+            Change.log(Change.RECIPES, Change.CREATED, recipe_ids)
+            schedule_prerender()
+            enqueue(update_signatures, recipe_ids)
+        transaction.on_commit(lambda: recipes_changed_in_bulk.send(
+            sender=Recipe, recipe_ids=recipe_ids, user_ids=()))
+    return len(recipes)
+
+
+def import_recipes(lines, batch_size=500, blobs_dir=None):
+    """Загружает рецепты из строк NDJSON пачками, возвращает их число"""
+    tags = dict(Tag.objects.values_list('slug', 'id'))
+    imported = 0
+    batch = []
+    for line in lines:
+        if not line.strip():
+            continue
+        batch.append(json.loads(line))
+        if len(batch) == batch_size:
+            imported += _import_batch(batch, tags, blobs_dir)
+            batch = []
+    if batch:
+        imported += _import_batch(batch, tags, blobs_dir)
+    return imported
@@ -0,0 +1,177 @@
+"""Статические HTML-снимки рецептов и sitemap для поисковых роботов.
+
+Снимок пишется в PRERENDER_ROOT/recipes/<id>.html, а время изменения
+файла выставляется равным Recipe.updated: перерисовываются только
+рецепты, у которых оно не совпадает. nginx отдаёт снимки роботам
+напрямую, минуя Django.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from xml.sax.saxutils import escape
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import Truncator
+from PIL import Image
+
+from jobs.queue import enqueue, on_commit_once
+from .models import IngredientAmount, Recipe
+
+CHUNK_SIZE = 100
+THUMB_SIZE = (600, 600)
+
+
+def _path(*parts):
+    return os.path.join(settings.PRERENDER_ROOT, *parts)
+
+
+def _version(updated):
+    """Recipe.updated в наносекундах с точностью до микросекунды"""
+    return int(updated.timestamp() * 1000000) * 1000
+
+
+def _write(path, content):
+    """Атомарная запись; True, если содержимое изменилось"""
+    if isinstance(content, str):
+        content = content.encode()
+    try:
+        with open(path, 'rb') as file:
+            if file.read() == content:
+                return False
+    except OSError:
+        pass
+    with open(path + '.tmp', 'wb') as file:
+        file.write(content)
+    os.replace(path + '.tmp', path)
+    return True
+
+
+def _thumb(image_name):
+    if not image_name or not default_storage.exists(image_name):
+        return None
+    name = os.path.splitext(os.path.basename(image_name))[0] + '.jpg'
+    path = _path('thumbs', name)
+    if not os.path.exists(path):
+        with default_storage.open(image_name) as file:
+            with Image.open(file) as image:
+                image = image.convert('RGB')
+                image.thumbnail(THUMB_SIZE)
+                image.save(path + '.tmp', 'JPEG', quality=80,
+                           optimize=True)
+        os.replace(path + '.tmp', path)
+    return f'{settings.SITE_URL}/prerendered/thumbs/{name}'
+
+
+def render_chunk(recipe_ids):
+    """Рисует снимки пачки рецептов; выполняется в процессе пула"""
+    recipes = Recipe.objects.filter(id__in=recipe_ids).select_related(
+        'author').prefetch_related('tags')
+    ingredients = {}
+    for amount in IngredientAmount.objects.filter(
+            recipe_id__in=recipe_ids).select_related(
+                'ingredients').order_by('id'):
+        ingredients.setdefault(amount.recipe_id, []).append(amount)
+    for recipe in recipes:
+        url = f'{settings.SITE_URL}/recipes/{recipe.id}'
+        html = render_to_string('recipes/prerendered.html', {
+            'recipe': recipe,
+            'url': url,
+            'description': Truncator(' '.join(recipe.text.split())).chars(200),
+            'thumb': _thumb(recipe.image.name),
+            'tags': [tag.name for tag in recipe.tags.all()],
+            'ingredients': ingredients.get(recipe.id, []),
+        })
+        path = _path('recipes', f'{recipe.id}.html')
+        _write(path, html)
+        version = _version(recipe.updated)
+        os.utime(path, ns=(version, version))
+    connections.close_all()
+    return len(recipe_ids)
+
+
+def write_sitemaps(recipes):
+    """sitemap.xml с индексом частей по SITEMAP_SHARD_SIZE адресов"""
+    size = settings.SITEMAP_SHARD_SIZE
+    shards = [recipes[start:start + size]
+              for start in range(0, len(recipes), size)] or [[]]
+    names = []
+    for number, shard in enumerate(shards, start=1):
+        urls = ''.join(
+            f'<url><loc>{escape(settings.SITE_URL)}/recipes/{recipe_id}'
+            f'</loc><lastmod>{updated.date().isoformat()}</lastmod></url>\n'
+            for recipe_id, updated in shard)
+        names.append(f'sitemap-{number}.xml')
+        _write(_path(names[-1]),
+               '<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<urlset xmlns="http://www.sitemaps.org/schemas/'
+               f'sitemap/0.9">\n{urls}</urlset>\n')
+    for name in os.listdir(settings.PRERENDER_ROOT):
+        if name.startswith('sitemap-') and name not in names:
+            os.remove(_path(name))
+    index = ''.join(
+        f'<sitemap><loc>{escape(settings.SITE_URL)}/{name}</loc></sitemap>\n'
+        for name in names)
+    _write(_path('sitemap.xml'),
+           '<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<sitemapindex xmlns="http://www.sitemaps.org/schemas/'
+           f'sitemap/0.9">\n{index}</sitemapindex>\n')
+
+
+def prerender_recipes(processes=1, force=False):
+    """Перерисовывает изменённые рецепты, удаляет снимки удалённых"""
+    for directory in ('recipes', 'thumbs'):
+        os.makedirs(_path(directory), exist_ok=True)
+    recipes = list(Recipe.objects.filter(
+        author__is_deleted=False, is_deleted=False).order_by('id').values_list(
+            'id', 'updated'))
+    changed = []
+    for recipe_id, updated in recipes:
+        try:
+            mtime = os.stat(_path('recipes', f'{recipe_id}.html')).st_mtime_ns
+        except OSError:
+            mtime = None
+        if force or mtime != _version(updated):
+            changed.append(recipe_id)
+    chunks = [changed[start:start + CHUNK_SIZE]
+              for start in range(0, len(changed), CHUNK_SIZE)]
+    if processes > 1 and len(chunks) > 1:
+        connections.close_all()
+        with ProcessPoolExecutor(
+                processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup) as pool:
+            rendered = sum(pool.map(render_chunk, chunks))
+    else:
+        rendered = sum(map(render_chunk, chunks))
+    alive = {f'{recipe_id}.html' for recipe_id, _ in recipes}
+    for name in os.listdir(_path('recipes')):
+        if name.endswith('.html') and name not in alive:
+            os.remove(_path('recipes', name))
+    write_sitemaps(recipes)
+    return rendered
+
+
+def prerender_changed():
+    """Фоновая задача: снимки рецептов, изменившихся с прошлого раза"""
+    prerender_recipes(settings.PRERENDER_PROCESSES)
+
+
+def _enqueue_prerender():
+    # Отметка ставится после фиксации: откат не должен её оставить
+    delay = settings.PRERENDER_DELAY_SECONDS
+    if cache.add('prerender:scheduled', True, delay):
+        enqueue(prerender_changed,
+                run_at=timezone.now() + timedelta(seconds=delay))
+
+
+def schedule_prerender():
+    """Ставит отложенную перерисовку; частые изменения склеиваются"""
+    if settings.PRERENDER_ON_CHANGE:
+        on_commit_once(_enqueue_prerender)
@@ -0,0 +1,148 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.db import transaction
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from users.models import Follow, User
+from .models import (Change, Favorite, ImageBlob, Ingredient,
+                     IngredientAmount, Recipe, ShoppingCart, Tag)
+from .prerender import schedule_prerender
+from .similarity import update_signature
+
+# Рецепты созданы, изменены или удалены в обход save() и delete():
+# сигналы моделей не срабатывают, кэши сбрасываются по этому сигналу.
+# Аргументы: recipe_ids и user_ids — чьи избранное и корзина задеты
+recipes_changed_in_bulk = Signal()
+
+
+def touch_recipes(recipe_ids):
+    """Обновляет отметку изменения рецептов без вызова save()"""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    Recipe.objects.filter(id__in=recipe_ids).update(updated=timezone.now())
+    Change.log(Change.RECIPES, Change.UPDATED, recipe_ids)
+    schedule_prerender()
+    recipes_changed_in_bulk.send(sender=Recipe, recipe_ids=recipe_ids,
+                                 user_ids=())
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def ingredient_amount_changed(sender, instance, **kwargs):
+    touch_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        touch_recipes([instance.id])
+    elif action == 'pre_clear':
+        touch_recipes(instance.recipes.values_list('id', flat=True))
+    else:
+        touch_recipes(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def tag_changed(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    # Связи с рецептами удаляются каскадом без m2m_changed
+    touch_recipes(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None,
+                   **kwargs):
+    # Вход в систему сохраняет только last_login, рецептов он не меняет
+    if created or (update_fields is not None
+                   and set(update_fields) <= {'last_login', 'password'}):
+        return
+    touch_recipes(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_image(sender, instance, **kwargs):
+    instance._saved_image = Recipe.objects.filter(
+        pk=instance.pk).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    if instance.image.name != instance._saved_image:
+        ImageBlob.change_refs(instance.image.name, 1)
+        ImageBlob.change_refs(instance._saved_image, -1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_deleted(sender, instance, **kwargs):
+    image = instance.__dict__.get('image')
+    ImageBlob.change_refs(getattr(image, 'name', image), -1)
+
+
+def change_action(signal, created):
+    if signal is post_delete:
+        return Change.DELETED
+    return Change.CREATED if created else Change.UPDATED
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, signal, created=False, **kwargs):
+    Change.log(Change.RECIPES, change_action(signal, created),
+               [instance.id])
+    schedule_prerender()
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def user_recipe_changed(sender, instance, signal, created=False, **kwargs):
+    collection = (Change.FAVORITES if sender is Favorite
+                  else Change.SHOPPING_CART)
+    Change.log(collection, change_action(signal, created),
+               [instance.recipe_id], instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follow_changed(sender, instance, signal, created=False, **kwargs):
+    Change.log(Change.SUBSCRIPTIONS, change_action(signal, created),
+               [instance.author_id], instance.user_id)
+
+
+class SignatureUpdate:
+    """Пересчёт сигнатур после транзакции, один на все её рецепты"""
+
+    def __init__(self):
+        self.recipe_ids = set()
+
+    def __call__(self):
+        for recipe_id in sorted(self.recipe_ids):
+            update_signature(recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def schedule_signature(sender, instance, **kwargs):
+    recipe_id = instance.id if sender is Recipe else instance.recipe_id
+    # При откате транзакции Django сам убирает её колбэки из списка
+    pending = next((
+        callback for _, callback in transaction.get_connection().run_on_commit
+        if isinstance(callback, SignatureUpdate)), None)
+    if pending is not None:
+        pending.recipe_ids.add(recipe_id)
+        return
+    pending = SignatureUpdate()
+    pending.recipe_ids.add(recipe_id)
+    transaction.on_commit(pending)
@@ -0,0 +1,156 @@
+"""Поиск похожих рецептов: MinHash по ингредиентам и словам названия.
+
+Сигнатура из NUM_HASHES минимумов делится на BANDS полос по ROWS
+значений; рецепты с совпавшей хотя бы одной полосой — кандидаты в
+дубликаты, их сходство оценивается по долям совпавших минимумов.
+При 16 полосах по 4 значения кандидатами почти наверняка станут
+рецепты с коэффициентом Жаккара от 0.5.
+"""
+import hashlib
+import random
+import re
+from array import array
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import IngredientAmount, Recipe, RecipeBucket, RecipeSignature
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+MASK = (1 << 64) - 1
+_random = random.Random(20230217)
+HASHES = [(_random.randrange(1, MASK, 2), _random.randrange(MASK))
+          for _ in range(NUM_HASHES)]
+
+
+def shingles(name, ingredient_ids):
+    words = re.findall(r'\w{3,}', name.lower())
+    return ({f'i:{pk}' for pk in ingredient_ids}
+            | {f'n:{word}' for word in words})
+
+
+def _hash(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+def minhash(items):
+    hashes = [_hash(item) for item in items] or [MASK]
+    return [min([(a * value + b) & MASK for value in hashes])
+            for a, b in HASHES]
+
+
+def band_buckets(signature):
+    """Хэш каждой полосы сигнатуры, знаковое 64-битное число"""
+    return [
+        int.from_bytes(hashlib.blake2b(
+            array('Q', signature[band * ROWS:(band + 1) * ROWS]).tobytes(),
+            digest_size=8).digest(), 'big', signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second):
+    return sum(a == b for a, b in zip(first, second)) / NUM_HASHES
+
+
+def pack(signature):
+    return array('Q', signature).tobytes()
+
+
+def unpack(data):
+    return array('Q', bytes(data)).tolist()
+
+
+def update_signature(recipe_id):
+    """Пересчитывает сигнатуру и полосы рецепта, если он изменился"""
+    recipe = Recipe.objects.filter(id=recipe_id).values(
+        'name', 'updated').first()
+    if recipe is None or RecipeSignature.objects.filter(
+            recipe_id=recipe_id, source_updated=recipe['updated']).exists():
+        return
+    signature = minhash(shingles(
+        recipe['name'], IngredientAmount.objects.filter(
+            recipe_id=recipe_id).values_list('ingredients_id', flat=True)))
+    with transaction.atomic():
+        RecipeSignature.objects.update_or_create(
+            recipe_id=recipe_id,
+            defaults={'minhash': pack(signature),
+                      'source_updated': recipe['updated']})
+        RecipeBucket.objects.filter(recipe_id=recipe_id).delete()
+        RecipeBucket.objects.bulk_create(
+            RecipeBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+            for band, bucket in enumerate(band_buckets(signature)))
+
+
+def update_signatures(recipe_ids):
+    """Фоновая задача: сигнатуры рецептов, созданных пачкой"""
+    for recipe_id in recipe_ids:
+        update_signature(recipe_id)
+
+
+def similar_recipes(name, ingredient_ids, exclude=None, threshold=0.5,
+                    limit=10):
+    """Похожие рецепты: список пар (id, оценка сходства)"""
+    signature = minhash(shingles(name, ingredient_ids))
+    matches = Q()
+    for band, bucket in enumerate(band_buckets(signature)):
+        matches |= Q(band=band, bucket=bucket)
+    candidates = RecipeBucket.objects.filter(matches)
+    if exclude is not None:
+        candidates = candidates.exclude(recipe_id=exclude)
+    candidate_ids = candidates.values('recipe_id').annotate(
+        bands=Count('id')).order_by('-bands').values_list(
+            'recipe_id', flat=True)[:limit * 5]
+    scored = [
+        (recipe_id, similarity(signature, unpack(data)))
+        for recipe_id, data in RecipeSignature.objects.filter(
+            recipe_id__in=list(candidate_ids)).values_list(
+                'recipe_id', 'minhash')
+    ]
+    scored = [pair for pair in scored if pair[1] >= threshold]
+    return sorted(scored, key=lambda pair: -pair[1])[:limit]
+
+
+def similar_by_signature(signatures, threshold=0.5, limit=10):
+    """Похожие рецепты для нескольких сохранённых сигнатур за два запроса.
+
+    Принимает {id рецепта: сигнатура}, возвращает {id рецепта: список
+    пар (id, оценка сходства)}; сам рецепт в свой список не попадает.
+    """
+    if not signatures:
+        return {}
+    queries = defaultdict(list)
+    for recipe_id, signature in signatures.items():
+        for band, bucket in enumerate(band_buckets(signature)):
+            queries[band, bucket].append(recipe_id)
+    matches = Q()
+    for band, bucket in queries:
+        matches |= Q(band=band, bucket=bucket)
+    bands = {recipe_id: Counter() for recipe_id in signatures}
+    for candidate, band, bucket in RecipeBucket.objects.filter(
+            matches).values_list('recipe_id', 'band', 'bucket'):
+        for recipe_id in queries[band, bucket]:
+            if candidate != recipe_id:
+                bands[recipe_id][candidate] += 1
+    candidates = {
+        recipe_id: [candidate for candidate, _ in counter.most_common(
+            limit * 5)]
+        for recipe_id, counter in bands.items()}
+    wanted = {candidate for ids in candidates.values() for candidate in ids}
+    stored = {
+        recipe_id: unpack(data)
+        for recipe_id, data in RecipeSignature.objects.filter(
+            recipe_id__in=wanted).values_list('recipe_id', 'minhash')}
+    result = {}
+    for recipe_id, ids in candidates.items():
+        scored = [(candidate, similarity(signatures[recipe_id],
+                                         stored[candidate]))
+                  for candidate in ids if candidate in stored]
+        result[recipe_id] = sorted(
+            (pair for pair in scored if pair[1] >= threshold),
+            key=lambda pair: -pair[1])[:limit]
+    return result
@@ -0,0 +1,59 @@
+from django.urls import reverse
+
+from recipes.models import Favorite, Ingredient, IngredientAmount, Recipe, Tag
+from recipes.similarity import update_signature
+from users.models import User
+
+from backend.testing import ChangelistQueriesTest
+
+
+def create_recipes(count):
+    """Рецепты с тэгом, ингредиентами и отметками в избранном"""
+    author = User.objects.create(username=f'author-{count}',
+                                 email=f'author-{count}@localhost')
+    tag = Tag.objects.create(name=f'tag-{count}', color='#000000',
+                             slug=f'tag-{count}')
+    ingredients = [
+        Ingredient.objects.create(name=f'ингредиент {count}-{number}',
+                                  measurement_unit='г')
+        for number in range(3)]
+    recipes = [
+        Recipe.objects.create(author=author, name=f'Рецепт {number}',
+                              text='Текст', cooking_time=10,
+                              image='recipes/test.png')
+        for number in range(count)]
+    for recipe in recipes:
+        recipe.tags.add(tag)
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredients=ingredient, amount=1)
+            for ingredient in ingredients)
+        Favorite.objects.create(user=author, recipe=recipe)
+    return recipes
+
+
+class RecipeAdminQueriesTest(ChangelistQueriesTest):
+
+    def test_recipe_changelist(self):
+        create_recipes(3)
+        self.assert_changelist_queries(
+            reverse('admin:recipes_recipe_changelist'), 5)
+        create_recipes(30)
+        self.assert_changelist_queries(
+            reverse('admin:recipes_recipe_changelist'), 5)
+
+    def test_ingredient_changelist(self):
+        create_recipes(3)
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'продукт {number}', measurement_unit='г')
+            for number in range(150))
+        self.assert_changelist_queries(
+            reverse('admin:recipes_ingredient_changelist'), 5)
+        self.assert_changelist_queries(
+            reverse('admin:recipes_ingredient_changelist') + '?q=прод', 5)
+
+    def test_signature_changelist(self):
+        for recipe in create_recipes(25):
+            update_signature(recipe.id)
+        response = self.assert_changelist_queries(
+            reverse('admin:recipes_recipesignature_changelist'), 6)
+        self.assertContains(response, '(100%)')
@@ -0,0 +1,33 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from recipes.models import ImageBlob
+
+
+class GcImagesTest(TestCase):
+
+    def setUp(self):
+        ImageBlob.objects.create(name='recipes/orphan.png')
+        ImageBlob.objects.update(
+            updated=timezone.now() - timedelta(hours=48))
+
+    def gc(self):
+        with mock.patch('recipes.management.commands.gc_images.'
+                        'default_storage') as storage:
+            call_command('gc_images', '--grace-hours', '24',
+                         stdout=mock.Mock())
+        return storage.delete.call_args_list
+
+    def test_old_orphan_is_deleted(self):
+        self.assertEqual(self.gc(), [mock.call('recipes/orphan.png')])
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_reference_restarts_grace_period(self):
+        ImageBlob.change_refs('recipes/orphan.png', 1)
+        ImageBlob.change_refs('recipes/orphan.png', -1)
+        self.assertEqual(self.gc(), [])
+        self.assertTrue(ImageBlob.objects.exists())
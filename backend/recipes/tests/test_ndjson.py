@@ -0,0 +1,63 @@
+import hashlib
+import json
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from api.caching import generation
+from recipes.models import Change, Recipe, RecipeSignature, Tag
+from recipes.ndjson import export_recipes, import_recipes
+from users.models import User
+
+from backend.testing import local_cache
+
+
+@override_settings(CACHES=local_cache('recipes-ndjson-tests'))
+class NdjsonTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.author = User.objects.create(username='cook',
+                                          email='cook@localhost')
+        Tag.objects.create(name='Завтрак', color='#FFAA00', slug='breakfast')
+
+    def record(self, name):
+        return json.dumps({
+            'name': name, 'text': 'Текст', 'cooking_time': 5,
+            'author': 'cook', 'tags': ['breakfast'],
+            'ingredients': [['соль', 'г', 1], ['сахар', 'г', 2]],
+            'image': None}, ensure_ascii=False)
+
+    def test_import_logs_changes_signatures_and_bumps_caches(self):
+        before = generation('recipe-ingredients')
+        with self.captureOnCommitCallbacks(execute=True):
+            imported = import_recipes(
+                [self.record('Каша'), self.record('Омлет')])
+        self.assertEqual(imported, 2)
+        ids = set(Recipe.objects.values_list('id', flat=True))
+        self.assertEqual(set(Change.objects.filter(
+            collection=Change.RECIPES, action=Change.CREATED).values_list(
+                'object_id', flat=True)), ids)
+        self.assertEqual(set(RecipeSignature.objects.values_list(
+            'recipe_id', flat=True)), ids)
+        self.assertNotEqual(generation('recipe-ingredients'), before)
+
+    def test_export_reuses_content_addressed_name(self):
+        content = b'not really a png'
+        name = default_storage.save('photo.png', ContentFile(content))
+        Recipe.objects.create(author=self.author, name='Каша', text='Текст',
+                              cooking_time=5, image=name)
+        with mock.patch('recipes.ndjson.hashlib.sha256') as sha256:
+            line, = export_recipes()
+        sha256.assert_not_called()
+        self.assertEqual(json.loads(line)['image']['sha256'],
+                         hashlib.sha256(content).hexdigest())
@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from jobs.models import Job
+from recipes.prerender import schedule_prerender
+
+from backend.testing import local_cache
+
+
+@override_settings(CACHES=local_cache('recipes-prerender-tests'),
+                   PRERENDER_ON_CHANGE=True)
+class SchedulePrerenderTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rollback_does_not_block_scheduling(self):
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                schedule_prerender()
+                1 / 0
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            schedule_prerender()
+            schedule_prerender()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Job.objects.filter(
+            task='recipes.prerender.prerender_changed').count(), 1)
@@ -0,0 +1,88 @@
+"""Популярные рецепты по добавлениям в избранное и корзину.
+
+Вклад события экспоненциально затухает с периодом полураспада
+TRENDING_HALF_LIFE_HOURS. Вместо ежечасного пересчёта всех рецептов
+вклад хранится приведённым к эпохе: w * 2 ** ((t - EPOCH) / half_life).
+Порядок по такой сумме совпадает с порядком по затухшей популярности
+в любой момент, поэтому обновлять нужно только рецепты с новыми
+событиями. Чтобы сумма не переполнялась, хранится её двоичный логарифм.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from jobs.models import Job
+from .models import Favorite, Recipe, ShoppingCart, Trending
+
+EPOCH = datetime(2023, 1, 1, tzinfo=dt_timezone.utc)
+WEIGHTS = ((Favorite, 1.0), (ShoppingCart, 1.0))
+
+
+def log_weight(moment, weight=1.0):
+    """log2 вклада события, приведённого к эпохе"""
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return math.log2(weight) + (moment - EPOCH).total_seconds() / half_life
+
+
+def log_add(first, second):
+    """log2(2 ** first + 2 ** second) без переполнения"""
+    if first is None:
+        return second
+    high, low = max(first, second), min(first, second)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def refresh_trending():
+    """Добавляет к популярности события с прошлого запуска"""
+    since = Trending.objects.aggregate(since=Max('updated'))['since']
+    until = timezone.now() - timedelta(
+        seconds=settings.CHANGES_SETTLE_SECONDS)
+    scores = {}
+    for model, weight in WEIGHTS:
+        events = model.objects.filter(created__lte=until)
+        if since is not None:
+            events = events.filter(created__gt=since)
+        for recipe_id, created in events.values_list(
+                'recipe_id', 'created').iterator():
+            scores[recipe_id] = log_add(scores.get(recipe_id),
+                                        log_weight(created, weight))
+    if not scores:
+        return 0
+    with transaction.atomic():
+        existing = Trending.objects.select_for_update().in_bulk(
+            list(scores))
+        for recipe_id, trending in existing.items():
+            trending.score = log_add(trending.score, scores[recipe_id])
+            trending.updated = until
+        Trending.objects.bulk_update(existing.values(),
+                                     ('score', 'updated'), batch_size=500)
+        alive = Recipe.objects.filter(
+            id__in=scores.keys() - existing.keys()).values_list(
+                'id', flat=True)
+        Trending.objects.bulk_create(
+            [Trending(recipe_id=recipe_id, score=scores[recipe_id],
+                      updated=until) for recipe_id in alive],
+            batch_size=500)
+    return len(scores)
+
+
+def refresh_trending_periodically():
+    """Фоновая задача: обновляет популярность и ставит себя снова"""
+    refresh_trending()
+    enqueue(refresh_trending_periodically, run_at=timezone.now()
+            + timedelta(minutes=settings.TRENDING_REFRESH_MINUTES))
+
+
+def schedule_trending():
+    """Ставит периодическое обновление, если его ещё нет в очереди"""
+    task = (f'{refresh_trending_periodically.__module__}.'
+            f'{refresh_trending_periodically.__qualname__}')
+    if Job.objects.filter(task=task, status__in=(
+            Job.QUEUED, Job.RUNNING)).exists():
+        return None
+    return enqueue(task)
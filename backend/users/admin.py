@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.admin import register
 
+from recipes.deletion import soft_delete_user
 from .models import Follow, User
 
 
@@ -8,13 +9,28 @@ from .models import Follow, User
 class PersonAdmin(admin.ModelAdmin):
     list_display = ('username', 'first_name',
                     'last_name', 'email', 'password')
-    list_filter = ('first_name', 'email',)
+    list_filter = ('is_staff', 'is_active', 'is_deleted',)
+    search_fields = ('^username', '^email',)
+    show_full_result_count = False
     save_on_top = True
 
+    def get_deleted_objects(self, objs, request):
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        soft_delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            soft_delete_user(user)
+
 
 @register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('author', 'user',)
-    search_fields = ('user', 'author',)
+    list_select_related = ('author', 'user',)
+    search_fields = ('^user__username', '^author__username',)
+    autocomplete_fields = ('user', 'author',)
+    show_full_result_count = False
     list_per_page = 20
     save_on_top = True
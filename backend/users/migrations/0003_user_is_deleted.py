@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20230211_1517'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='is_deleted',
+            field=models.BooleanField(db_index=True, default=False, help_text='Ожидает фонового удаления', verbose_name='Удалён'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+COLUMNS = ('username', 'email')
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS users_user_{column}_prefix '
+            f'ON users_user (UPPER({column}::text) text_pattern_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in COLUMNS:
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS users_user_{column}_prefix')
+
+
+class Migration(migrations.Migration):
+    """Индексы для поиска по началу имени и почты без учёта регистра.
+
+    SearchFilter с '^' строит UPPER(поле::text) LIKE UPPER('...%'),
+    такое выражение использует только индекс с text_pattern_ops.
+    """
+
+    dependencies = [
+        ('users', '0003_user_is_deleted'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
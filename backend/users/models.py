@@ -30,6 +30,10 @@ class User(AbstractUser):
                                  max_length=MAX_LEN_FIELD,
                                  blank=False,
                                  help_text=USER_HELP)
+    is_deleted = models.BooleanField('Удалён',
+                                     default=False,
+                                     db_index=True,
+                                     help_text='Ожидает фонового удаления')
 
     class Meta:
         verbose_name = 'Пользователь'
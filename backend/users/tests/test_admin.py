@@ -0,0 +1,29 @@
+from django.urls import reverse
+
+from users.models import Follow, User
+
+from backend.testing import ChangelistQueriesTest
+
+
+class UserAdminQueriesTest(ChangelistQueriesTest):
+
+    def create_users(self, count, prefix):
+        users = [User.objects.create(username=f'{prefix}-{number}',
+                                     email=f'{prefix}-{number}@localhost')
+                 for number in range(count)]
+        Follow.objects.bulk_create(
+            Follow(user=user, author=users[0]) for user in users[1:])
+
+    def test_user_changelist(self):
+        url = reverse('admin:users_user_changelist')
+        self.create_users(3, 'small')
+        self.assert_changelist_queries(url, 4)
+        self.create_users(120, 'large')
+        self.assert_changelist_queries(url, 4)
+        self.assert_changelist_queries(url + '?q=large&is_deleted__exact=0',
+                                       4)
+
+    def test_follow_changelist(self):
+        self.create_users(40, 'follower')
+        self.assert_changelist_queries(
+            reverse('admin:users_follow_changelist'), 4)
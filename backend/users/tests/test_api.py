@@ -0,0 +1,51 @@
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.models import Follow, User
+
+
+class UsersListQueriesTest(TestCase):
+    """Список пользователей: число запросов не зависит от размера страницы"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reader',
+                                       email='reader@localhost')
+        authors = [User.objects.create(username=f'author-{number}',
+                                       email=f'author-{number}@localhost')
+                   for number in range(120)]
+        Follow.objects.bulk_create(
+            Follow(user=cls.user, author=author) for author in authors[::2])
+        cls.token = Token.objects.create(user=cls.user).key
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def assert_list_queries(self, path, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list(self):
+        # Токен, число записей и сама страница
+        small = self.assert_list_queries('/api/users/?limit=6', 3)
+        large = self.assert_list_queries('/api/users/?limit=100', 3)
+        self.assertEqual(len(small['results']), 6)
+        self.assertEqual(len(large['results']), 100)
+        subscribed = {item['username']: item['is_subscribed']
+                      for item in large['results']}
+        self.assertTrue(subscribed['author-0'])
+        self.assertFalse(subscribed['author-1'])
+
+    def test_search(self):
+        data = self.assert_list_queries(
+            '/api/users/?search=author-1&limit=100', 3)
+        self.assertEqual(data['count'], 31)
+
+    def test_sparse_fields(self):
+        data = self.assert_list_queries(
+            '/api/users/?fields=id,username&limit=100', 3)
+        self.assertEqual(set(data['results'][0]), {'id', 'username'})